@@ -0,0 +1,301 @@
+import argparse
+import importlib
+import itertools
+import json
+import math
+import os
+import random
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bitboard import (COLOR_BLACK, COLOR_WHITE, START_BLACK, START_WHITE, get_moves, get_flips, popcount,
+                      bitboards_to_board, iter_bits)
+
+_ENGINES = {}
+# random_openings 连续抽到重复开局的次数上限
+OPENING_ATTEMPTS = 1000
+
+
+def square_name(sq):
+    return 'abcdefgh'[sq & 7] + str((sq >> 3) + 1)
+
+
+def parse_square(name):
+    return (int(name[1]) - 1) * 8 + 'abcdefgh'.index(name[0])
+
+
+def play_opening(moves):
+    # 从初始局面走完开局序列，返回 (black, white, color)；遇到无子可下时自动让步
+    black, white, color = START_BLACK, START_WHITE, COLOR_BLACK
+    for sq in moves:
+        P, O = (black, white) if color == COLOR_BLACK else (white, black)
+        if not get_moves(P, O):
+            color = -color
+            P, O = O, P
+        if not (get_moves(P, O) >> sq) & 1:
+            raise ValueError('illegal opening move ' + square_name(sq))
+        flips = get_flips(P, O, sq)
+        P, O = P | flips | (1 << sq), O ^ flips
+        black, white = (P, O) if color == COLOR_BLACK else (O, P)
+        color = -color
+    return black, white, color
+
+
+def random_openings(count, plies, seed):
+    # 随机开局，去重；每个开局之后会交换颜色各下一局
+    # 步数太少时不同的局面可能不足 count 个：连续 OPENING_ATTEMPTS 次都重复就停止，返回已找到的
+    rng = random.Random(seed)
+    openings = []
+    seen = set()
+    misses = 0
+    while len(openings) < count:
+        if misses >= OPENING_ATTEMPTS:
+            warnings.warn('only %d distinct openings of %d plies, %d requested' % (len(openings), plies, count))
+            break
+        black, white, color = START_BLACK, START_WHITE, COLOR_BLACK
+        moves = []
+        for _ in range(plies):
+            P, O = (black, white) if color == COLOR_BLACK else (white, black)
+            legal = list(iter_bits(get_moves(P, O)))
+            if not legal:
+                break
+            sq = rng.choice(legal)
+            moves.append(sq)
+            black, white, color = play_opening(moves)
+        if (black, white, color) not in seen:
+            seen.add((black, white, color))
+            openings.append(moves)
+            misses = 0
+        else:
+            misses += 1
+    return openings
+
+
+def load_openings(path):
+    # 每行一个开局，如 "d3 c5 f6"
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                openings.append([parse_square(s) for s in line.split()])
+    return openings
+
+
+def _init_worker(engine_names):
+    for name in engine_names:
+        _ENGINES[name] = importlib.import_module(name)
+
+
+def play_game(game):
+    # 在工作进程中完整地下一局；走出非法着法或抛出异常的一方判负
+    engines = {COLOR_BLACK: game['black'], COLOR_WHITE: game['white']}
+    ais = {c: _ENGINES[name].AI(8, c, game['time_out']) for c, name in engines.items()}
+    if game['time_limit'] is not None:
+        # 只对提供 time_limit 属性的引擎（如 main.AI）生效，旧版本固定为 4.8 秒
+        for ai in ais.values():
+            if hasattr(ai, 'time_limit'):
+                ai.time_limit = game['time_limit']
+    for ai in ais.values():
+        # 多个对局已经并行，引擎内部的并行搜索默认只用一个线程
+        if hasattr(ai, 'threads'):
+            ai.threads = game['threads']
+        # 开局前的预热不计入用时
+        if hasattr(ai, 'warm_up'):
+            ai.warm_up()
+    used = {COLOR_BLACK: 0.0, COLOR_WHITE: 0.0}
+    longest = {COLOR_BLACK: 0.0, COLOR_WHITE: 0.0}
+    black, white, color = play_opening(game['opening'])
+    forfeit = None
+    moves = []
+    while True:
+        P, O = (black, white) if color == COLOR_BLACK else (white, black)
+        legal = get_moves(P, O)
+        if not legal:
+            if not get_moves(O, P):
+                break
+            color = -color
+            continue
+        board = bitboards_to_board(black, white, COLOR_BLACK)
+        start = time.perf_counter()
+        try:
+            candidate_list = ais[color].go(board)
+            move = candidate_list[-1] if candidate_list else None
+        except Exception:
+            move = None
+        elapsed = time.perf_counter() - start
+        used[color] += elapsed
+        longest[color] = max(longest[color], elapsed)
+        sq = -1 if move is None else int(move[0]) * 8 + int(move[1])
+        if sq < 0 or not (legal >> sq) & 1:
+            forfeit = color
+            break
+        flips = get_flips(P, O, sq)
+        P, O = P | flips | (1 << sq), O ^ flips
+        black, white = (P, O) if color == COLOR_BLACK else (O, P)
+        moves.append(square_name(sq))
+        color = -color
+
+    black_discs, white_discs = popcount(black), popcount(white)
+    if forfeit is not None:
+        winner = 'white' if forfeit == COLOR_BLACK else 'black'
+    elif black_discs < white_discs:
+        winner = 'black'
+    elif white_discs < black_discs:
+        winner = 'white'
+    else:
+        winner = 'draw'
+    return {
+        'id': game['id'],
+        'black': game['black'],
+        'white': game['white'],
+        'opening': ' '.join(square_name(sq) for sq in game['opening']),
+        'moves': ' '.join(moves),
+        'black_discs': black_discs,
+        'white_discs': white_discs,
+        'winner': winner,
+        'forfeit': None if forfeit is None else ('black' if forfeit == COLOR_BLACK else 'white'),
+        'time': {'black': round(used[COLOR_BLACK], 3), 'white': round(used[COLOR_WHITE], 3)},
+        'max_move_time': {'black': round(longest[COLOR_BLACK], 3), 'white': round(longest[COLOR_WHITE], 3)},
+        'time_out': game['time_out'],
+        'time_limit': game['time_limit'],
+        'threads': game['threads'],
+    }
+
+
+def schedule(engine_names, openings, time_out, time_limit=None, threads=1):
+    # 每对引擎在每个开局上交换颜色各下一局。对局 id 由开局的着法和用时设置组成，不依赖开局的序号：
+    # 换了 --seed、--openings 或开局文件后续跑同一个结果文件，只跳过真正下过的对局
+    games = []
+    control = 'to%g-tl%s-th%d' % (time_out, 'none' if time_limit is None else '%g' % time_limit, threads)
+    for a, b in itertools.combinations(engine_names, 2):
+        for opening in openings:
+            moves = ''.join(square_name(sq) for sq in opening) or 'start'
+            for swap, (black, white) in enumerate(((a, b), (b, a))):
+                games.append({
+                    'id': '%s-%s-%s-%d-%s' % (a, b, moves, swap, control),
+                    'black': black,
+                    'white': white,
+                    'opening': opening,
+                    'time_out': time_out,
+                    'time_limit': time_limit,
+                    'threads': threads,
+                })
+    return games
+
+
+def load_results(path):
+    records = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # 中断时可能留下半行
+                        pass
+    return records
+
+
+def elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def wilson_interval(score, n, z=1.96):
+    # 得分率的 Wilson 置信区间；全胜或全负时按样本标准差算出的区间宽度为 0，Wilson 区间不会
+    d = 1 + z * z / n
+    center = (score + z * z / (2 * n)) / d
+    half = z * math.sqrt(score * (1 - score) / n + z * z / (4 * n * n)) / d
+    return center - half, center + half
+
+
+def summarize(records, engine_names):
+    # 对每一对引擎统计第一个引擎的胜负和、胜率、Elo 差及其 95% 置信区间
+    report = []
+    for a, b in itertools.combinations(engine_names, 2):
+        results = []
+        for r in records:
+            if {r['black'], r['white']} != {a, b}:
+                continue
+            if r['winner'] == 'draw':
+                results.append(0.5)
+            else:
+                results.append(1.0 if r[r['winner']] == a else 0.0)
+        n = len(results)
+        if n == 0:
+            continue
+        wins = results.count(1.0)
+        draws = results.count(0.5)
+        losses = n - wins - draws
+        score = sum(results) / n
+        low, high = wilson_interval(score, n)
+        report.append({
+            'engine': a,
+            'opponent': b,
+            'games': n,
+            'wins': wins,
+            'draws': draws,
+            'losses': losses,
+            'score': round(score, 4),
+            'elo': round(elo(score), 1),
+            'elo_low': round(elo(low), 1),
+            'elo_high': round(elo(high), 1),
+        })
+    return report
+
+
+def print_report(report):
+    print('%-8s %-8s %6s %6s %6s %6s %7s %8s %17s' % (
+        'engine', 'opponent', 'games', 'win', 'draw', 'loss', 'score', 'elo', '95% ci'))
+    for row in report:
+        print('%-8s %-8s %6d %6d %6d %6d %7.3f %8.1f %8.1f ~ %6.1f' % (
+            row['engine'], row['opponent'], row['games'], row['wins'], row['draws'], row['losses'],
+            row['score'], row['elo'], row['elo_low'], row['elo_high']))
+
+
+def run(engine_names, openings, time_out, out, workers, time_limit=None, threads=1):
+    done = {r['id'] for r in load_results(out)}
+    games = [g for g in schedule(engine_names, openings, time_out, time_limit, threads) if g['id'] not in done]
+    print('%d games to play, %d already in %s' % (len(games), len(done), out))
+    with open(out, 'a') as f, ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                  initargs=(engine_names,)) as pool:
+        futures = [pool.submit(play_game, g) for g in games]
+        for i, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            if i % 10 == 0 or i == len(futures):
+                print('%d/%d games finished' % (i, len(futures)))
+    report = summarize(load_results(out), engine_names)
+    print_report(report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless self-play arena for the AI modules.')
+    parser.add_argument('--engines', nargs='+', default=['main', 'ver6'],
+                        help='engine modules, each providing AI(chessboard_size, color, time_out)')
+    parser.add_argument('--openings', type=int, default=100, help='number of random openings')
+    parser.add_argument('--opening-plies', type=int, default=6, help='plies in each random opening')
+    parser.add_argument('--opening-file', help='file with one opening per line, e.g. "d3 c5 f6"')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-out', type=float, default=5, help='time_out passed to AI.__init__')
+    parser.add_argument('--time-limit', type=float, help='per-move search time for engines with a time_limit')
+    parser.add_argument('--threads', type=int, default=1, help='search threads per engine with a threads attribute')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='arena_results.jsonl', help='JSONL file, appended and resumed')
+    args = parser.parse_args()
+
+    if args.opening_file:
+        openings = load_openings(args.opening_file)
+    else:
+        openings = random_openings(args.openings, args.opening_plies, args.seed)
+    run(args.engines, openings, args.time_out, args.out, args.workers, args.time_limit, args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+import numba
+import numpy as np
+
+from bitboard import COLOR_BLACK, popcount, get_moves, boards_to_bitboards
+from evaluate import evaluate_bb
+
+# 批量估值，供对局统计、训练数据标注和根结点分析使用。并行编译较慢，引擎本身不导入这个模块
+
+
+@numba.njit('void(uint64[:, :], int64[:], int64[:], uint64[:])', nogil=True, parallel=True, cache=True)
+def _evaluate_batch(bbs, scores, mobility, moves):
+    for n in numba.prange(bbs.shape[0]):
+        m = get_moves(bbs[n, 0], bbs[n, 1])
+        scores[n] = evaluate_bb(bbs[n, 0], bbs[n, 1])
+        mobility[n] = popcount(m)
+        moves[n] = m
+
+
+def evaluate_batch(positions, color=COLOR_BLACK):
+    # 批量估值：positions 为 (N, 8, 8) 的棋盘数组（color 为 AI 一方），或 (N, 2) 的 uint64 位棋盘（每行 (P, O)，
+    # P 为 AI 一方）。返回 (scores, mobility, moves)：AI 一方的估值、可走步数与可走位置的位掩码
+    positions = np.asarray(positions)
+    if positions.ndim == 3:
+        bbs = boards_to_bitboards(positions, color)
+    else:
+        bbs = np.ascontiguousarray(positions, dtype=np.uint64)
+    n = len(bbs)
+    scores = np.empty(n, dtype=np.int64)
+    mobility = np.empty(n, dtype=np.int64)
+    moves = np.empty(n, dtype=np.uint64)
+    _evaluate_batch(bbs, scores, mobility, moves)
+    return scores, mobility, moves
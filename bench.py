@@ -0,0 +1,235 @@
+import argparse
+import importlib
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bitboard import (COLOR_BLACK, START_BLACK, START_WHITE, get_moves, get_flips, popcount, board_to_bitboards,
+                      bitboards_to_board, iter_bits)
+from search import ST_NODES
+from perft import perft_board, engine_generator
+
+ENGINES = ['ver1', 'ver2', 'ver3', 'ver4', 'ver5', 'ver6', 'main']
+
+# 固定的测试局面：(阶段, 随机走的步数)，由固定种子生成，保证不同版本之间可比
+CORPUS_PLIES = [('opening', 6), ('opening', 10), ('midgame', 24), ('midgame', 30),
+                ('midgame', 36), ('endgame', 44), ('endgame', 48)]
+CORPUS_SEED = 2024
+
+# 冷启动测量：新进程从导入引擎到走完第一步的时间。支持 time_limit 的引擎第一步只给 COLD_MOVE_SECONDS 秒，
+# 其余时间都是启动开销
+COLD_MOVE_SECONDS = 0.5
+COLD_START_SCRIPT = '''
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, %r)
+import numpy as np
+module = __import__(%r)
+imported = time.perf_counter()
+ai = module.AI(8, %d, 5)
+if hasattr(ai, 'time_limit'):
+    ai.time_limit = %r
+if hasattr(ai, 'use_book'):
+    ai.use_book = False
+created = time.perf_counter()
+ai.go(np.array(%r))
+done = time.perf_counter()
+print(json.dumps({'import_seconds': imported - start, 'first_move_seconds': done - created,
+                  'total_seconds': done - start}))
+'''
+
+
+def corpus(seed=CORPUS_SEED):
+    # 返回 [(name, phase, board, color)]，board 为与评测程序一致的 NumPy 棋盘
+    positions = []
+    rng = random.Random(seed)
+    for k, (phase, plies) in enumerate(CORPUS_PLIES):
+        while True:
+            P, O, color = START_BLACK, START_WHITE, COLOR_BLACK
+            for _ in range(plies):
+                moves = get_moves(P, O)
+                if not moves:
+                    P, O, color = O, P, -color
+                    moves = get_moves(P, O)
+                    if not moves:
+                        break
+                sq = rng.choice(list(iter_bits(moves)))
+                flips = get_flips(P, O, sq)
+                P, O, color = O ^ flips, P | flips | (1 << sq), -color
+            if get_moves(P, O) and popcount(P | O) == plies + 4:
+                break
+        positions.append(('%s-%d' % (phase, k), phase, bitboards_to_board(P, O, color), color))
+    return positions
+
+
+class Engine(object):
+    # 把各版本 AI 的固定深度搜索统一成 search(depth)，返回结点数
+    def __init__(self, module, board, color):
+        self.ai = module.AI(8, color, 5)
+        self.board = np.array(board)
+        self.color = color
+        self.kernel = hasattr(self.ai, 'stats')
+        self.nodes = 0
+        if not self.kernel and hasattr(self.ai, 'minimax'):
+            # 结点数定义为 minimax 的调用次数；递归调用也经过实例属性，所以都会被计数
+            search = self.ai.minimax
+
+            def counted(*args):
+                self.nodes += 1
+                return search(*args)
+            self.ai.minimax = counted
+
+    def can_search(self):
+        return hasattr(self.ai, 'minimax')
+
+    def search(self, depth):
+        self.nodes = 0
+        if self.kernel:
+            me, opp = board_to_bitboards(self.board, self.color)
+            self.ai.stop[0] = 0
+            self.ai.stats[:] = 0
+            self.ai.generation += 1
+            self.ai.minimax(me, opp, depth)
+            return int(self.ai.stats[ST_NODES])
+        self.ai.minimax(self.board, depth, -float('inf'), float('inf'), True, time.time(), 1e9)
+        return self.nodes
+
+
+def measure_search(module, board, color, max_depth, budget):
+    # 逐层加深，记录每层的结点数与耗时；累计耗时超过 budget 后不再加深
+    engine = Engine(module, board, color)
+    if not engine.can_search():
+        return None
+    rows = []
+    total = 0.0
+    for depth in range(1, max_depth + 1):
+        start = time.perf_counter()
+        nodes = engine.search(depth)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        rows.append({'depth': depth, 'nodes': nodes, 'seconds': round(elapsed, 6),
+                     'time_to_depth': round(total, 6)})
+        if total > budget:
+            break
+    nodes = sum(r['nodes'] for r in rows)
+    ratios = [rows[i]['nodes'] / rows[i - 1]['nodes'] for i in range(1, len(rows)) if rows[i - 1]['nodes']]
+    return {
+        'depths': rows,
+        'depth_reached': rows[-1]['depth'],
+        'nodes': nodes,
+        'nodes_per_sec': round(nodes / total) if total else 0,
+        'ebf': round(math.exp(sum(math.log(r) for r in ratios) / len(ratios)), 3) if ratios else None,
+    }
+
+
+def measure_cold_start(name, board, color):
+    # 在新的编译缓存目录下连续启动两次：第一次需要编译（并写入缓存），第二次从缓存加载
+    cache_dir = tempfile.mkdtemp(prefix='numba-cache-')
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    script = COLD_START_SCRIPT % (os.path.dirname(os.path.abspath(__file__)), name, color, COLD_MOVE_SECONDS,
+                                  np.asarray(board).tolist())
+    result = {}
+    try:
+        for run in ('compile', 'cached'):
+            out = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True)
+            result[run] = {k: round(v, 4) for k, v in json.loads(out.stdout.splitlines()[-1]).items()}
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return result
+
+
+def bench_engine(name, positions, max_depth, budget, perft_depth, cold_start=True):
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    import_time = time.perf_counter() - start
+    result = {'engine': name, 'import_seconds': round(import_time, 4), 'positions': {}}
+    if cold_start:
+        _, _, board, color = positions[len(positions) // 2]
+        result['cold_start'] = measure_cold_start(name, board, color)
+
+    # 第一次调用包含 numba 的即时编译，与同一调用的第二次耗时相减即为编译时间
+    warm_name, _, warm_board, warm_color = positions[0]
+    engine = Engine(module, warm_board, warm_color)
+    if engine.can_search():
+        start = time.perf_counter()
+        engine.search(2)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        engine.search(2)
+        second = time.perf_counter() - start
+        result['compile_seconds'] = round(max(first - second, 0.0), 4)
+
+    total_nodes = 0
+    total_time = 0.0
+    for pos_name, phase, board, color in positions:
+        row = {'phase': phase}
+        search = measure_search(module, board, color, max_depth, budget)
+        if search is not None:
+            row['search'] = search
+            total_nodes += search['nodes']
+            total_time += search['depths'][-1]['time_to_depth']
+        if perft_depth:
+            start = time.perf_counter()
+            row['perft'] = perft_board(engine_generator(module), board, color, perft_depth)
+            row['perft_seconds'] = round(time.perf_counter() - start, 4)
+        result['positions'][pos_name] = row
+    if total_time:
+        result['nodes_per_sec'] = round(total_nodes / total_time)
+    return result
+
+
+def compare(report, baseline):
+    # 与之前保存的结果比较每个引擎的 nodes/sec
+    old = {r['engine']: r for r in baseline['engines']}
+    for r in report['engines']:
+        if r['engine'] in old and old[r['engine']].get('nodes_per_sec') and r.get('nodes_per_sec'):
+            ratio = r['nodes_per_sec'] / old[r['engine']]['nodes_per_sec']
+            print('%-6s %12d -> %12d nodes/sec  x%.2f' % (
+                r['engine'], old[r['engine']]['nodes_per_sec'], r['nodes_per_sec'], ratio), file=sys.stderr)
+        if r['engine'] in old and 'cold_start' in old[r['engine']] and 'cold_start' in r:
+            before = old[r['engine']]['cold_start']['cached']['total_seconds']
+            after = r['cold_start']['cached']['total_seconds']
+            print('%-6s %10.2fs -> %10.2fs import to first move' % (r['engine'], before, after), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Node-throughput benchmark for the AI modules.')
+    parser.add_argument('--engines', nargs='+', default=ENGINES)
+    parser.add_argument('--max-depth', type=int, default=8)
+    parser.add_argument('--budget', type=float, default=3.0, help='seconds of search per engine and position')
+    parser.add_argument('--perft-depth', type=int, default=3, help='0 disables perft')
+    parser.add_argument('--out', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='earlier JSON report to compare nodes/sec against')
+    parser.add_argument('--no-cold-start', action='store_true', help='skip the import-to-first-move measurement')
+    args = parser.parse_args()
+
+    positions = corpus()
+    report = {
+        'corpus_seed': CORPUS_SEED,
+        'max_depth': args.max_depth,
+        'budget': args.budget,
+        'perft_depth': args.perft_depth,
+        'engines': [bench_engine(name, positions, args.max_depth, args.budget, args.perft_depth,
+                                 not args.no_cold_start) for name in args.engines],
+    }
+    text = json.dumps(report, indent=1, sort_keys=True)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import numpy as np
+import numba
+import jitcache  # noqa: F401  设置编译缓存目录，必须先于任何内核定义
+
+COLOR_BLACK = -1
+COLOR_WHITE = 1
+COLOR_NONE = 0
+
+# 位棋盘：每个局面用两个 64 位整数表示（己方 P、对方 O），第 row 行第 col 列对应第 row*8+col 位。
+U = np.uint64
+ALL_MASK = U(0xFFFFFFFFFFFFFFFF)
+NOT_A_FILE = U(0xFEFEFEFEFEFEFEFE)      # 去掉第 0 列
+NOT_H_FILE = U(0x7F7F7F7F7F7F7F7F)      # 去掉第 7 列
+# 初始局面中黑方与白方的子（黑方先走）
+START_BLACK = 0x0000000810000000
+START_WHITE = 0x0000001008000000
+
+
+@numba.njit('uint64(uint64, int64)', inline='always', cache=True)
+def shift(x, d):
+    # 0~7 依次为：上、下、左、右、左上、右上、左下、右下，与 get_flips 的 directions 顺序一致
+    if d == 0:
+        return x >> U(8)
+    elif d == 1:
+        return x << U(8)
+    elif d == 2:
+        return (x >> U(1)) & NOT_H_FILE
+    elif d == 3:
+        return (x << U(1)) & NOT_A_FILE
+    elif d == 4:
+        return (x >> U(9)) & NOT_H_FILE
+    elif d == 5:
+        return (x >> U(7)) & NOT_A_FILE
+    elif d == 6:
+        return (x << U(7)) & NOT_H_FILE
+    else:
+        return (x << U(9)) & NOT_A_FILE
+
+
+@numba.njit('int64(uint64)', cache=True)
+def popcount(x):
+    x = x - ((x >> U(1)) & U(0x5555555555555555))
+    x = (x & U(0x3333333333333333)) + ((x >> U(2)) & U(0x3333333333333333))
+    x = (x + (x >> U(4))) & U(0x0F0F0F0F0F0F0F0F)
+    return np.int64((x * U(0x0101010101010101)) >> U(56))
+
+
+@numba.njit('int64(uint64)', cache=True)
+def lsb_index(x):
+    # x 非零；返回最低位 1 的下标
+    return popcount((x & (~x + U(1))) - U(1))
+
+
+@numba.njit('uint64(uint64)', inline='always', cache=True)
+def dilate(x):
+    # x 中各格子连同其 8 个相邻格
+    h = x | ((x >> U(1)) & NOT_H_FILE) | ((x << U(1)) & NOT_A_FILE)
+    return h | (h >> U(8)) | (h << U(8))
+
+
+@numba.njit('uint64(uint64, uint64)', cache=True)
+def get_moves(P, O):
+    empty = ~(P | O)
+    moves = U(0)
+    for d in range(8):
+        t = shift(P, d) & O
+        t |= shift(t, d) & O
+        t |= shift(t, d) & O
+        t |= shift(t, d) & O
+        t |= shift(t, d) & O
+        t |= shift(t, d) & O
+        moves |= shift(t, d) & empty
+    return moves
+
+
+@numba.njit('int64(uint64, uint64)', cache=True)
+def count_moves(P, O):
+    # 行动力：只数合法走步，不计算翻转
+    return popcount(get_moves(P, O))
+
+
+@numba.njit('uint64(uint64, uint64, int64)', cache=True)
+def get_flips(P, O, sq):
+    move = U(1) << U(sq)
+    flips = U(0)
+    for d in range(8):
+        line = U(0)
+        x = shift(move, d)
+        while x & O:
+            line |= x
+            x = shift(x, d)
+        if x & P:
+            flips |= line
+    return flips
+
+
+def as_board(board):
+    # 评测程序传入的棋盘可能是任意整数或浮点类型，也可能只读；内核只编译 int64 一种签名，入口处统一转换一次
+    # （已经是可写的 C 连续 int64 数组时不复制）
+    return np.require(board, np.int64, ('C', 'W'))
+
+
+@numba.njit('UniTuple(uint64, 2)(int64[:, :], int64)', cache=True)
+def board_to_bitboards(board, color):
+    P = U(0)
+    O = U(0)
+    for i in range(8):
+        for j in range(8):
+            if board[i, j] == color:
+                P |= U(1) << U(i * 8 + j)
+            elif board[i, j] == -color:
+                O |= U(1) << U(i * 8 + j)
+    return P, O
+
+
+def boards_to_bitboards(boards, color):
+    # board_to_bitboards 的批量版本：(N, 8, 8) 的棋盘数组转为 (N, 2) 的 uint64 数组，每行为 (P, O)
+    cells = np.asarray(boards).reshape(-1, 64)
+    bits = U(1) << np.arange(64, dtype=np.uint64)
+    bbs = np.empty((len(cells), 2), dtype=np.uint64)
+    bbs[:, 0] = np.where(cells == color, bits, U(0)).sum(axis=1, dtype=np.uint64)
+    bbs[:, 1] = np.where(cells == -color, bits, U(0)).sum(axis=1, dtype=np.uint64)
+    return bbs
+
+
+def bitboards_to_board(P, O, color):
+    board = np.zeros((8, 8), dtype=np.int64)
+    for sq in range(64):
+        if (P >> sq) & 1:
+            board[sq >> 3, sq & 7] = color
+        elif (O >> sq) & 1:
+            board[sq >> 3, sq & 7] = -color
+    return board
+
+
+def iter_bits(x):
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
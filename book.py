@@ -0,0 +1,125 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from bitboard import START_BLACK, START_WHITE, get_moves, get_flips, iter_bits
+from symmetry import canonical, SYM_SQ, INV_SQ
+
+# 开局库文件：8 字节文件头之后是按 key 升序排列的定长记录，加载时直接 memmap，不读入内存。
+# key 为对称归一化之后局面的 Zobrist hash（走子方为 P），move 为归一化局面中的最佳走步
+BOOK_MAGIC = b'RRBOOK1\0'
+ENTRY_DTYPE = np.dtype([('key', '<u8'), ('move', 'i1'), ('depth', 'i1'), ('score', '<i2')])
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')
+
+BUILD_PLIES = 6
+BUILD_DEPTH = 10
+
+
+def write_book(path, keys, moves, depths, scores):
+    entries = np.zeros(len(keys), dtype=ENTRY_DTYPE)
+    entries['key'] = keys
+    entries['move'] = moves
+    entries['depth'] = depths
+    entries['score'] = np.clip(scores, -32768, 32767)
+    entries.sort(order='key')
+    with open(path, 'wb') as f:
+        f.write(BOOK_MAGIC)
+        entries.tofile(f)
+
+
+class OpeningBook(object):
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(BOOK_MAGIC)) != BOOK_MAGIC:
+                raise ValueError('not an opening book: ' + path)
+        n = (os.path.getsize(path) - len(BOOK_MAGIC)) // ENTRY_DTYPE.itemsize
+        self.entries = np.memmap(path, dtype=ENTRY_DTYPE, mode='r', offset=len(BOOK_MAGIC), shape=(n,))
+        self.keys = self.entries['key']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def probe(self, P, O):
+        # P 为走子方；命中时返回 (sq, score, depth)，否则返回 None
+        if not len(self.entries):
+            return None
+        h, s = canonical(P, O, 1)
+        i = int(np.searchsorted(self.keys, h))
+        if i >= len(self.keys) or self.keys[i] != h:
+            return None
+        e = self.entries[i]
+        sq = int(INV_SQ[s, int(e['move'])])
+        if not (get_moves(P, O) >> sq) & 1:
+            # hash 冲突
+            return None
+        return sq, int(e['score']), int(e['depth'])
+
+
+def load_book(path=BOOK_PATH):
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def enumerate_positions(plies):
+    # 从初始局面出发 plies 步之内的所有局面（按对称去重），返回 [(P, O)]，P 为走子方且有子可下
+    start = (START_BLACK, START_WHITE)
+    seen = {canonical(start[0], start[1], 1)[0]}
+    frontier = [start]
+    positions = [start]
+    for _ in range(plies):
+        nxt = []
+        for P, O in frontier:
+            for sq in iter_bits(get_moves(P, O)):
+                flips = get_flips(P, O, sq)
+                child = (O ^ flips, P | flips | (1 << sq))
+                if not get_moves(*child):
+                    child = (child[1], child[0])
+                    if not get_moves(*child):
+                        continue
+                h = canonical(child[0], child[1], 1)[0]
+                if h not in seen:
+                    seen.add(h)
+                    nxt.append(child)
+        positions.extend(nxt)
+        frontier = nxt
+    return positions
+
+
+def build(path, plies=BUILD_PLIES, depth=BUILD_DEPTH, verbose=True):
+    # 对 plies 步之内的每个局面做 depth 层的固定深度搜索，记录最佳走步与得分
+    import main
+    ai = main.AI(8, -1, 5)
+    positions = enumerate_positions(plies)
+    keys, moves, depths, scores = [], [], [], []
+    start = time.perf_counter()
+    for k, (P, O) in enumerate(positions):
+        ai.generation += 1
+        ai.stop[0] = 0
+        ai.stats[:] = 0
+        score, sq = ai.minimax(P, O, depth)
+        h, s = canonical(P, O, 1)
+        keys.append(h)
+        moves.append(SYM_SQ[s, sq])
+        depths.append(depth)
+        scores.append(score)
+        if verbose and (k + 1) % 100 == 0:
+            print('%d/%d positions, %.1fs' % (k + 1, len(positions), time.perf_counter() - start))
+    write_book(path, np.array(keys, dtype=np.uint64), moves, depths, scores)
+    return len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the opening book from fixed-depth searches.')
+    parser.add_argument('--plies', type=int, default=BUILD_PLIES, help='book covers positions up to this many plies')
+    parser.add_argument('--depth', type=int, default=BUILD_DEPTH, help='search depth for every book position')
+    parser.add_argument('--out', default=BOOK_PATH)
+    args = parser.parse_args()
+    n = build(args.out, args.plies, args.depth)
+    print('%d positions written to %s' % (n, args.out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import numpy as np
+import numba
+from bitboard import U, get_moves, get_flips, popcount, lsb_index
+from search import ST_NODES, CHECK_MASK, INF
+
+# 空格数不超过 ENDGAME_EMPTIES 时改用精确残局求解
+ENDGAME_EMPTIES = 16
+# 求解之前先用普通的迭代加深保底，最多使用本步剩余时间的这一比例
+ENDGAME_SEARCH_FRACTION = 0.25
+# 空格数不少于此值时按对方行动力排序（fastest-first），更少时只按奇偶性排序
+FASTEST_FIRST_EMPTIES = 7
+# 空格数不超过此值时使用不生成走步列表的小残局求解
+SMALL_EMPTIES = 4
+
+QUADRANT_MASK = np.array([
+    0x000000000F0F0F0F, 0x00000000F0F0F0F0,
+    0x0F0F0F0F00000000, 0xF0F0F0F000000000
+], dtype=np.uint64)
+
+
+@numba.njit('int64(uint64, uint64)', nogil=True, cache=True)
+def final_score(P, O):
+    # 求解结果均为站在走子一方的终局子数差（对方子数 - 己方子数），子少者胜
+    return popcount(O) - popcount(P)
+
+
+@numba.njit('uint64(uint64)', nogil=True, cache=True)
+def odd_quadrants(empties):
+    # 空格数为奇数的象限，先在这些象限中落子（奇偶性排序）
+    odd = U(0)
+    for q in range(4):
+        if popcount(empties & QUADRANT_MASK[q]) & 1:
+            odd |= QUADRANT_MASK[q]
+    return odd
+
+
+@numba.njit('int64(uint64, uint64, int64)', nogil=True, cache=True)
+def solve_last1(P, O, sq):
+    bit = U(1) << U(sq)
+    flips = get_flips(P, O, sq)
+    if flips:
+        return popcount(O ^ flips) - popcount(P | flips | bit)
+    flips = get_flips(O, P, sq)
+    if flips:
+        return popcount(O | flips | bit) - popcount(P ^ flips)
+    return popcount(O) - popcount(P)
+
+
+@numba.njit('int64(uint64, uint64, int64, int64, boolean, int64[:])', nogil=True, cache=True)
+def solve_small(P, O, alpha, beta, passed, stats):
+    # 最后几个空格：直接在空格上尝试落子，不生成走步列表
+    stats[ST_NODES] += 1
+    empties = ~(P | O)
+    if empties == 0:
+        return final_score(P, O)
+    if (empties & (empties - U(1))) == 0:
+        return solve_last1(P, O, lsb_index(empties))
+    odd = odd_quadrants(empties)
+    value = -INF
+    for k in range(2):
+        m = empties & odd if k == 0 else empties & ~odd
+        while m:
+            sq = lsb_index(m)
+            m &= m - U(1)
+            flips = get_flips(P, O, sq)
+            if flips == 0:
+                continue
+            # 布尔常量写成 np.bool_ 的原因见 search.negamax
+            score = -solve_small(O ^ flips, P | flips | (U(1) << U(sq)), -beta, -alpha, np.bool_(False), stats)
+            if score > value:
+                value = score
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        return value
+    if value == -INF:
+        if passed:
+            return final_score(P, O)
+        return -solve_small(O, P, -beta, -alpha, np.bool_(True), stats)
+    return value
+
+
+@numba.njit('int64(uint64, uint64, int64, int64, int64[:, :])', nogil=True, cache=True)
+def order_endgame_moves(P, O, n_empties, ply, move_buf):
+    # move_buf[ply] 中存 key * 64 + sq，按升序排列：对方行动力少、落在奇数象限的走步在前
+    moves = get_moves(P, O)
+    odd = odd_quadrants(~(P | O))
+    n = 0
+    while moves:
+        sq = lsb_index(moves)
+        bit = moves & (~moves + U(1))
+        moves ^= bit
+        key = 0 if bit & odd else 1
+        if n_empties >= FASTEST_FIRST_EMPTIES:
+            flips = get_flips(P, O, sq)
+            key += 2 * popcount(get_moves(O ^ flips, P | flips | bit))
+        v = key * 64 + sq
+        j = n
+        while j > 0 and move_buf[ply, j - 1] > v:
+            move_buf[ply, j] = move_buf[ply, j - 1]
+            j -= 1
+        move_buf[ply, j] = v
+        n += 1
+    return n
+
+
+@numba.njit('int64(uint64, uint64, int64, int64, boolean, int64, int64, int64[:], int64[:], int64[:, :])',
+            nogil=True, cache=True)
+def solve(P, O, alpha, beta, passed, n_empties, ply, stop, stats, move_buf):
+    if n_empties <= SMALL_EMPTIES:
+        return solve_small(P, O, alpha, beta, passed, stats)
+    stats[ST_NODES] += 1
+    if (stats[ST_NODES] & CHECK_MASK) == 0 and stop[0]:
+        return 0
+
+    n = order_endgame_moves(P, O, n_empties, ply, move_buf)
+    if n == 0:
+        if passed:
+            return final_score(P, O)
+        return -solve(O, P, -beta, -alpha, np.bool_(True), n_empties, ply + 1, stop, stats, move_buf)
+
+    value = -INF
+    for i in range(n):
+        sq = move_buf[ply, i] & 63
+        flips = get_flips(P, O, sq)
+        score = -solve(O ^ flips, P | flips | (U(1) << U(sq)), -beta, -alpha, np.bool_(False),
+                       n_empties - 1, ply + 1, stop, stats, move_buf)
+        if stop[0]:
+            return 0
+        if score > value:
+            value = score
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+    return value
+
+
+@numba.njit('Tuple((int64, int64))(uint64, uint64, int64, int64, int64[:], int64[:], int64[:, :])', nogil=True,
+            cache=True)
+def solve_root(P, O, alpha, beta, stop, stats, move_buf):
+    # 在窗口 (alpha, beta) 内求解；返回 (score, best_sq)，无子可下时 best_sq 为 -1
+    stats[ST_NODES] += 1
+    n_empties = popcount(~(P | O))
+    n = order_endgame_moves(P, O, n_empties, 0, move_buf)
+    value = -INF
+    best_sq = -1
+    for i in range(n):
+        sq = move_buf[0, i] & 63
+        flips = get_flips(P, O, sq)
+        score = -solve(O ^ flips, P | flips | (U(1) << U(sq)), -beta, -alpha, False,
+                       n_empties - 1, 1, stop, stats, move_buf)
+        if stop[0]:
+            break
+        if score > value:
+            value = score
+            best_sq = sq
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+    return value, best_sq
@@ -0,0 +1,107 @@
+import numpy as np
+import numba
+from bitboard import U, popcount, count_moves, dilate
+from patterns import evaluate_patterns, pattern_delta, PATTERNS_ENABLED
+
+# 格子的位置权重：evaluate_board_numb 的估值表，也是走步排序（ordering.py）与候选列表的次序
+WEIGHT_MATRIX = np.array([
+    [1, 8, 3, 7, 7, 3, 8, 1],
+    [8, 3, 2, 5, 5, 2, 3, 8],
+    [3, 2, 6, 6, 6, 6, 2, 3],
+    [7, 5, 6, 4, 4, 6, 5, 7],
+    [7, 5, 6, 4, 4, 6, 5, 7],
+    [3, 2, 6, 6, 6, 6, 2, 3],
+    [8, 3, 2, 5, 5, 2, 3, 8],
+    [1, 8, 3, 7, 7, 3, 8, 1]
+], dtype=np.int64)
+
+# 与 WEIGHT_MATRIX 对应的特征掩码
+CORNER_MASK = U(0x8100000000000081)     # 权重 1：四个角
+C_SQUARE_MASK = U(0x4281000000008142)   # 权重 8：角旁边的边上格
+EDGE_MASK = U(0x000001010101003C)       # evaluate_board_numb 中的 ledg/redg：第 0 行与第 0 列（去掉角和 C 位）
+
+
+def _disc_values():
+    # 每个格子上一枚 AI 子、一枚对方子对估值的贡献，evaluate_bb 即为这两张表按子求和
+    ai_disc = np.zeros(64, dtype=np.int64)
+    opp_disc = np.zeros(64, dtype=np.int64)
+    for sq in range(64):
+        bit = 1 << sq
+        ai_disc[sq] = -5 - 1000 * bool(bit & int(CORNER_MASK)) + 10 * bool(bit & int(C_SQUARE_MASK)) \
+            + bool(bit & int(EDGE_MASK))
+        opp_disc[sq] = 5 + 20 * bool(bit & int(CORNER_MASK)) - 20 * bool(bit & int(C_SQUARE_MASK)) \
+            - 2 * bool(bit & int(EDGE_MASK))
+    return ai_disc, opp_disc
+
+
+AI_DISC, OPP_DISC = _disc_values()
+
+
+@numba.njit('int64(uint64, uint64)', nogil=True, cache=True)
+def evaluate_linear(P, O):
+    # 与 evaluate_board_numb 完全一致，P 为 AI 一方
+    son = popcount(O) - popcount(P)
+    lcor = popcount(P & CORNER_MASK)
+    rcor = popcount(O & CORNER_MASK)
+    lang = popcount(P & C_SQUARE_MASK)
+    rang = popcount(O & C_SQUARE_MASK)
+    ledg = popcount(P & EDGE_MASK)
+    redg = popcount(O & EDGE_MASK)
+    return 5*son + 10*lang - 20*rang - 1000*lcor + 20*rcor + ledg - 2*redg
+
+
+@numba.njit('int64(uint64, uint64)', nogil=True, cache=True)
+def evaluate_bb(P, O):
+    # P 为 AI 一方。有训练好的模式表（weights.bin）时估值完全由模式表给出，模式覆盖了所有格子，
+    # 按格子计分的线性项不再需要；否则仍用原来的线性项
+    if PATTERNS_ENABLED:
+        return evaluate_patterns(P, O)
+    return evaluate_linear(P, O)
+
+
+# 模式表在 8 种对称下不变（见 patterns.symmetrize）；线性项的 EDGE_MASK 只含第 0 行与第 0 列，不对称。
+# 估值对称时对称的局面才能共用置换表项（main.AI.use_symmetry）
+EVAL_SYMMETRIC = PATTERNS_ENABLED
+
+# 行动力特征的权重（站在走子一方）：行动力为双方合法走步数之差，潜在行动力为与对方子相邻的空格数之差，
+# 前沿子为与空格相邻的己方子数之差。三者都与走子方有关，不能随走步增量更新，只在搜索的叶结点计算。
+# 权重由对局测试确定：符号取反时几乎全负，前沿子在模式估值之外没有带来提升
+MOBILITY_WEIGHT = 1
+POTENTIAL_WEIGHT = 1
+FRONTIER_WEIGHT = 0
+MOBILITY_ENABLED = bool(MOBILITY_WEIGHT or POTENTIAL_WEIGHT or FRONTIER_WEIGHT)
+
+
+@numba.njit('UniTuple(int64, 3)(uint64, uint64)', nogil=True, cache=True)
+def mobility_features(P, O):
+    # P 为走子一方；全部用移位与 popcount 对整个棋盘并行计算，不逐格生成走步
+    empty = ~(P | O)
+    near_empty = dilate(empty)
+    mobility = count_moves(P, O) - count_moves(O, P)
+    potential = popcount(dilate(O) & empty) - popcount(dilate(P) & empty)
+    frontier = popcount(P & near_empty) - popcount(O & near_empty)
+    return mobility, potential, frontier
+
+
+@numba.njit('int64(uint64, uint64)', nogil=True, cache=True)
+def mobility_score(P, O):
+    # 叶结点估值中与走子方有关的部分，站在走子一方（P）
+    if not MOBILITY_ENABLED:
+        return 0
+    mobility, potential, frontier = mobility_features(P, O)
+    return MOBILITY_WEIGHT * mobility + POTENTIAL_WEIGHT * potential + FRONTIER_WEIGHT * frontier
+
+
+@numba.njit('int64(uint64, uint64, int64, int64, uint64)', nogil=True, cache=True)
+def move_delta(P, O, side, sq, flips):
+    # P/O 为走子前走子方与对方的子，side 一方在 sq 落子、翻转 flips 后估值（站在 AI 一方）的变化量；
+    # 角上的子不会被翻转
+    bit = U(1) << U(sq)
+    if PATTERNS_ENABLED:
+        if side == 1:
+            return pattern_delta(P, O, side, flips | bit, bit)
+        return pattern_delta(O, P, side, flips | bit, bit)
+    turned = 10 * popcount(flips) - 30 * popcount(flips & C_SQUARE_MASK) - 3 * popcount(flips & EDGE_MASK)
+    if side == 1:
+        return AI_DISC[sq] - turned
+    return OPP_DISC[sq] + turned
@@ -0,0 +1,46 @@
+import glob
+import hashlib
+import os
+import shutil
+
+import numba
+
+# numba 编译结果的磁盘缓存。go() 用到的内核都带显式签名和 cache=True：第一个进程导入时编译并写入缓存，
+# 之后的进程（包括 arena 的每个工作进程）直接加载。没有缓存时 import main 要编译约 20 秒（有缓存时约 1 秒），
+# 所以新的检出或修改了 DIGEST_FILES 之后、开始计时的对局之前先运行一次 python -c "import main" 生成缓存；
+# 缓存目录需要可写，否则每个进程都会重新编译。只给工具脚本用的内核（训练、perft、分析器、main 中原来的棋盘估值）
+# 不写签名，第一次调用时才编译（结果同样缓存），不计入导入时间。
+# numba 只按定义函数的源文件判断缓存是否过期，但内核会把其他文件中被调用的函数和全局数组
+# （例如从 weights.bin 读入的 PATTERN_WEIGHTS）一起编译进去，所以缓存目录按这些被其他内核使用的模块
+# 与权重文件的摘要区分。只在自己文件中使用的内核（main、endgame、batch、train、perft）由 numba 自己按文件判断，
+# 修改它们或其他工具脚本不会让全部缓存失效；新增被其他内核调用的模块时要加入 DIGEST_FILES。
+# 必须在定义任何内核之前导入（bitboard.py 第一行导入）
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIGEST_FILES = ('bitboard.py', 'tt.py', 'symmetry.py', 'patterns.py', 'evaluate.py', 'ordering.py', 'position.py',
+                'profiler.py', 'search.py', 'weights.bin')
+
+
+def source_digest():
+    h = hashlib.sha1()
+    for name in DIGEST_FILES:
+        path = os.path.join(ROOT, name)
+        if os.path.exists(path):
+            h.update(name.encode())
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def remove_stale(base, keep):
+    # 新建缓存目录时删除同一位置下其他摘要的旧目录
+    for path in glob.glob(os.path.join(base, 'numba-*')):
+        if os.path.basename(path) != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# 设置了 NUMBA_CACHE_DIR 时放在它下面（例如基准测试用空目录测量无缓存的冷启动）
+BASE_DIR = os.environ.get('NUMBA_CACHE_DIR') or os.path.join(ROOT, '__pycache__')
+CACHE_DIR = os.path.join(BASE_DIR, 'numba-' + source_digest())
+if not os.path.isdir(CACHE_DIR):
+    remove_stale(BASE_DIR, os.path.basename(CACHE_DIR))
+numba.config.CACHE_DIR = CACHE_DIR
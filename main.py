@@ -1,25 +1,39 @@
 import numpy as np
 import random
 import time
+import threading
 import numba
+from bitboard import START_BLACK, START_WHITE, as_board, board_to_bitboards, get_moves, count_moves, get_flips, popcount, iter_bits
+from search import (search_root, new_buffers, new_config, MAX_PLY, INF, ROOT_ORDER_DEPTH,
+                    CFG_PVS, CFG_KILLERS, CFG_HISTORY, CFG_ROOT_ORDER, CFG_SYMMETRY, CFG_PROFILE, ST_NODES,
+                    ST_HORIZON, ST_RESEARCH, ST_FAIL_LOW, ST_FAIL_HIGH, ST_CUTOFFS, ST_FIRST_CUTOFFS, ST_EVALS,
+                    ST_TT_PROBES, ST_TT_HITS, ST_PROF_SAMPLES, ST_PROF, STATS_SIZE)
+from ordering import NO_MOVE
+from smp import LazySMP
+from rootsplit import RootSplitter
+from timeman import TimeManager
+from ponder import Ponderer
+from book import load_book
+from tt import new_table, TT_SIZE_MB
+from position import set_position
+from endgame import solve_root, ENDGAME_EMPTIES, ENDGAME_SEARCH_FRACTION
+from evaluate import EVAL_SYMMETRIC, WEIGHT_MATRIX
+from telemetry import MoveTelemetry, TelemetryLog
 
 COLOR_BLACK = -1
 COLOR_WHITE = 1
 COLOR_NONE = 0
 random.seed(0)
 
-WEIGHT_MATRIX = np.array([
-    [1, 8, 3, 7, 7, 3, 8, 1],
-    [8, 3, 2, 5, 5, 2, 3, 8],
-    [3, 2, 6, 6, 6, 6, 2, 3],
-    [7, 5, 6, 4, 4, 6, 5, 7],
-    [7, 5, 6, 4, 4, 6, 5, 7],
-    [3, 2, 6, 6, 6, 6, 2, 3],
-    [8, 3, 2, 5, 5, 2, 3, 8],
-    [1, 8, 3, 7, 7, 3, 8, 1]
-], dtype=np.int64)
-
-@numba.njit
+# 渴望窗口的初始半宽（估值单位）、每次失败后的放大倍数，超过上限时改用完整窗口
+ASPIRATION_WINDOW = 50
+ASPIRATION_GROWTH = 4
+ASPIRATION_MAX = 2000
+
+# warm_up() 在初始局面上搜索的深度
+WARM_UP_DEPTH = 4
+
+@numba.njit(cache=True)
 def evaluate_board_numb(board, ai_color):
     score = 0
     rows, cols = board.shape
@@ -51,7 +65,7 @@ def evaluate_board_numb(board, ai_color):
                     redg += 1
     return 5*son + 10*lang - 20*rang - 1000*lcor + 20*rcor + ledg - 2*redg
 
-@numba.njit
+@numba.njit(cache=True)
 def get_flips_numb(board, row, col, color, board_size):
     flips = np.empty((56, 2), dtype=np.int64)
     count = 0
@@ -85,165 +99,402 @@ class AI(object):
         self.chessboard_size = chessboard_size
         self.color = color
         self.time_out = time_out
+        # 每一步的时间由 TimeManager 根据 time_out 和局面阶段分配；time_limit 不为 None 时作为固定的硬限制
+        self.time_limit = None
+        self.timeman = TimeManager(time_out)
         self.candidate_list = []
         self.total_time_used = 0
         self.move_count = 0
         self.count = 0
         self.round = 0
+        (self.bb, self.st, self.undo, self.stop, self.stats, self.move_buf,
+         self.killers, self.history) = new_buffers()
+        # 置换表在一局之内的多次 go() 之间保留，generation 用于替换上一步留下的旧项
+        self.tt_keys, self.tt_vals = new_table(TT_SIZE_MB)
+        self.generation = 0
+        self.endgame_empties = ENDGAME_EMPTIES
+        # PVS 与渴望窗口的开关；aspiration_window 为 0 时每一轮迭代都用完整窗口
+        self.use_pvs = True
+        self.aspiration_window = ASPIRATION_WINDOW
+        # 走步排序的开关；root_order_depth 为 0 时根结点不做浅层搜索排序
+        self.use_killers = True
+        self.use_history = True
+        self.root_order_depth = ROOT_ORDER_DEPTH
+        # 开局附近对称的局面共用置换表项；只有估值在对称下不变（使用模式表）时才正确
+        self.use_symmetry = EVAL_SYMMETRIC
+        self.cfg = new_config()
+        # 并行搜索（Lazy SMP）的线程数（含主线程），默认为 1，不启动辅助线程；
+        # 需要时由调用方打开，例如 ai.threads = smp.default_threads()
+        self.threads = 1
+        self.smp = None
+        # 大于 0 时改为把根走步分给这么多个进程并行搜索（进程池在第一次 go() 时建立并预热，之后一直保留）
+        self.root_split_workers = 0
+        self.splitter = None
+        # 开局库在启动时 memmap，命中时不搜索直接走库中的走步
+        self.book = load_book()
+        self.use_book = True
+        # 为 True 时在对方思考期间后台搜索预测的下一个局面
+        self.ponder = False
+        self.ponderer = None
+        self.ponder_hit = None
+        # 最近一次 go() 中每个完成的深度的统计：depth, score, nodes, seconds, researches, fail_low, fail_high,
+        # cutoffs, first_cutoffs, leaf_evals, tt_probes, tt_hits
+        self.depth_stats = []
+        # 最近一次 go() 的统计（telemetry.MoveTelemetry）；telemetry_path 不为 None 时每一步追加一行 JSON
+        self.telemetry = None
+        self.telemetry_path = None
+        self.telemetry_log = None
+        # 一步之内各轮迭代（及残局求解各阶段）的 stats 累计
+        self.move_totals = np.zeros(STATS_SIZE, dtype=np.int64)
+        self.depth_aborted = 0
+        # 设为 profiler.SearchProfile() 时打开分析模式，每次 go() 的时间按阶段累计到其中
+        self.profile = None
+
+    # 走步生成分两步：generate_move_mask / count_valid_moves 只求合法走步，不计算翻转；
+    # 真正落子时再用 move_flips 求这一步的翻转。generate_valid_moves 一次给出全部走步的翻转，只在确实需要时使用
+    def generate_move_mask(self, board, color):
+        # 返回 (P, O, moves)：color 一方与对方的位棋盘，以及合法走步的位掩码（sq = row * 8 + col）
+        board = as_board(board)
+        P, O = board_to_bitboards(board, color)
+        return P, O, get_moves(P, O)
 
-    def get_flips(self, board, row, col, color):
-        flips = []
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1),
-                      (-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for dr, dc in directions:
-            temp_flips = []
-            r, c = row + dr, col + dc
-            while 0 <= r < self.chessboard_size and 0 <= c < self.chessboard_size:
-                if board[r, c] == -color:
-                    temp_flips.append((r, c))
-                elif board[r, c] == color:
-                    if temp_flips:
-                        flips.extend(temp_flips)
-                    break
-                else:
-                    break
-                r += dr
-                c += dc
-        return flips
+    def count_valid_moves(self, board, color):
+        board = as_board(board)
+        P, O = board_to_bitboards(board, color)
+        return count_moves(P, O)
+
+    def move_flips(self, P, O, row, col):
+        return get_flips(P, O, row * 8 + col)
 
     def generate_valid_moves(self, board, color):
+        board = as_board(board)
+        P, O = board_to_bitboards(board, color)
+        return self.generate_bb_moves(P, O)
+
+    def generate_bb_moves(self, P, O):
+        # 走步格式与原来保持一致：((row, col), flips, w)，其中 flips 为翻转位掩码
         moves = []
-        for row in range(self.chessboard_size):
-            for col in range(self.chessboard_size):
-                if board[row, col] == COLOR_NONE:
-                    flips = self.get_flips(board, row, col, color)
-                    if flips:
-                        w = WEIGHT_MATRIX[row, col]
-                        moves.append(((row, col), flips, w))
+        for sq in iter_bits(get_moves(P, O)):
+            row, col = sq >> 3, sq & 7
+            moves.append(((row, col), get_flips(P, O, sq), WEIGHT_MATRIX[row, col]))
         return moves
-    def update(self, color, row, col, eval, op):
-        new_eval = eval
-        val = WEIGHT_MATRIX[row, col]
-        flg = (color == self.color)
-        if op == 0:
-            new_eval += -5 if flg else 5                    # son -5 +5
-            if val == 1:                                    # cor -1000 +20
-                new_eval += -1000 if flg else 20
-            elif val == 8:                                  # ang +10 -20
-                new_eval += 10 if flg else -20
-            elif (row and not col) or (not row and col):    # edg +1 -2
-                new_eval += 1 if flg else -2
-        else:
-            assert val != 1
-            new_eval += -10 if flg else 10                  # son -5 +5
-            if val == 8:                                    # ang +10 -20
-                new_eval += 30 if flg else -30
-            elif (row and not col) or (not row and col):    # edg +1 -2
-                new_eval += 3 if flg else -3
-        
-        return new_eval
-    
-    def apply_move(self, board, move, color, eval):
-        new_board = board.copy()
-        new_eval = eval
-        (row, col), flips, _ = move
-        new_board[row, col] = color
-        
-        new_eval = self.update(color, row, col, new_eval, 0)
-        
-        for r, c in flips:
-            new_board[r, c] = -new_board[r, c]
-            new_eval = self.update(new_board[r, c], r, c, new_eval, 1)
-        
-        return new_board, new_eval
+
+    def candidate_squares(self, moves):
+        # 走步掩码按位置权重从小到大排列为 [(row, col)]
+        return sorted(((sq >> 3, sq & 7) for sq in iter_bits(moves)), key=lambda m: WEIGHT_MATRIX[m])
 
     def evaluate_board(self, board):
+        board = as_board(board)
         return evaluate_board_numb(board, self.color)
 
-    def minimax(self, board, depth, alpha, beta, maximizing, start_time, time_limit, eval):
-        self.count += 1
-        if self.count % 16 == 0:
-            if time.time() - start_time > time_limit:
-                raise TimeoutError
-        if depth == 0:
-            return eval, None
-        
-        valid_moves = self.generate_valid_moves(board, self.color if maximizing else -self.color)
-        # 对 valid_moves 按照权重排序：己方回合降序排序，保证先搜索权重高的走步；对手回合升序排序。
-        if valid_moves:
-            if maximizing:
-                valid_moves.sort(key=lambda move: move[2], reverse=True)
+    def update_config(self):
+        self.cfg[CFG_PVS] = self.use_pvs
+        self.cfg[CFG_KILLERS] = self.use_killers
+        self.cfg[CFG_HISTORY] = self.use_history
+        self.cfg[CFG_ROOT_ORDER] = self.root_order_depth
+        self.cfg[CFG_SYMMETRY] = self.use_symmetry
+        self.cfg[CFG_PROFILE] = self.profile is not None
+
+    def minimax(self, me, opp, depth, alpha=-INF, beta=INF):
+        # 搜索在 search.negamax 中整体编译执行，这里只负责传入预分配的数组
+        set_position(self.bb, self.st, me, opp)
+        self.update_config()
+        return search_root(self.bb, self.st, self.undo, depth, alpha, beta, self.stop, self.stats, self.move_buf,
+                           self.killers, self.history, self.tt_keys, self.tt_vals, self.generation, self.cfg)
+
+    def to_move(self, me, opp, sq):
+        return ((sq >> 3, sq & 7), get_flips(me, opp, sq), WEIGHT_MATRIX[sq >> 3, sq & 7])
+
+    def aspiration_search(self, me, opp, depth, guess):
+        # 以上一轮的得分为中心开窗口，失败时向失败的一侧加宽，连续失败后退回完整窗口
+        delta = self.aspiration_window
+        if guess is None or delta <= 0:
+            return self.minimax(me, opp, depth)
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            score, sq = self.minimax(me, opp, depth, alpha, beta)
+            if self.stop[0]:
+                return score, sq
+            if score <= alpha:
+                self.stats[ST_FAIL_LOW] += 1
+                delta *= ASPIRATION_GROWTH
+                alpha = max(score - delta, -INF) if delta < ASPIRATION_MAX else -INF
+            elif score >= beta:
+                self.stats[ST_FAIL_HIGH] += 1
+                delta *= ASPIRATION_GROWTH
+                beta = min(score + delta, INF) if delta < ASPIRATION_MAX else INF
             else:
-                valid_moves.sort(key=lambda move: move[2])
-        
-        best_move = None
-        if maximizing:
-            value = -float('inf')
-            if not valid_moves:
-                score, _ = self.minimax(board, depth - 1, alpha, beta, False, start_time, time_limit, eval)
-                if score > value:
-                    value = score
-                alpha = max(alpha, value)
-            for move in valid_moves:
-                new_board, new_eval = self.apply_move(board, move, self.color, eval)
-                score, _ = self.minimax(new_board, depth - 1, alpha, beta, False, start_time, time_limit, new_eval)
-                if score > value:
-                    value = score
-                    best_move = move
-                alpha = max(alpha, value)
-                if beta <= alpha:
-                    break
-            return value, best_move
-        else:
-            value = float('inf')
-            if not valid_moves:
-                score, _ = self.minimax(board, depth - 1, alpha, beta, True, start_time, time_limit, eval)
-                if score < value:
-                    value = score
-                beta = min(beta, value)
-            for move in valid_moves:
-                new_board, new_eval = self.apply_move(board, move, -self.color, eval)
-                score, _ = self.minimax(new_board, depth - 1, alpha, beta, True, start_time, time_limit, new_eval)
-                if score < value:
-                    value = score
-                    best_move = move
-                beta = min(beta, value)
-                if beta <= alpha:
-                    break
-            return value, best_move
+                return score, sq
 
-    def iterative_deepening(self, board):
-        start_time = time.time()
-        time_limit = 4.8
-        depth = 5 if self.round <= 24 else 7
+    def start_helpers(self, me, opp, depth):
+        if self.threads <= 1:
+            return False
+        if self.smp is None or len(self.smp.buffers) != self.threads - 1:
+            self.smp = LazySMP(self.threads - 1)
+        self.update_config()
+        self.smp.start(me, opp, depth, self.stop, self.tt_keys, self.tt_vals, self.generation, self.cfg)
+        return True
+
+    def deepen(self, me, opp, depth, best_move=None, guess=None):
+        # best_move/guess 为已知的较浅一层的结果（来自后台思考），从 depth 继续加深
+        self.depth_stats = []
+        helpers = self.start_helpers(me, opp, depth)
+        while depth < MAX_PLY:
+            self.stats[:] = 0
+            start = time.perf_counter()
+            score, sq = self.aspiration_search(me, opp, depth, guess)
+            self.count = self.stats[ST_NODES]
+            self.move_totals += self.stats
+            if self.stop[0]:
+                self.depth_aborted = depth
+                break
+            guess = score
+            self.depth_stats.append({
+                'depth': depth,
+                'score': int(score),
+                'nodes': int(self.stats[ST_NODES]),
+                'seconds': round(time.perf_counter() - start, 6),
+                'researches': int(self.stats[ST_RESEARCH]),
+                'fail_low': int(self.stats[ST_FAIL_LOW]),
+                'fail_high': int(self.stats[ST_FAIL_HIGH]),
+                'cutoffs': int(self.stats[ST_CUTOFFS]),
+                'first_cutoffs': int(self.stats[ST_FIRST_CUTOFFS]),
+                'leaf_evals': int(self.stats[ST_EVALS]),
+                'tt_probes': int(self.stats[ST_TT_PROBES]),
+                'tt_hits': int(self.stats[ST_TT_HITS]),
+            })
+            if sq >= 0:
+                best_move = self.to_move(me, opp, sq)
+            if self.stats[ST_HORIZON] == 0:
+                # 已经搜到终局，再加深没有意义
+                break
+            if not self.timeman.iteration_done(int(self.stats[ST_NODES]), sq):
+                break
+            depth += 1
+        if helpers:
+            # 取完成深度最深的结果，深度相同时以主线程为准
+            helper_best, helper_nodes = self.smp.finish(self.stop)
+            self.count += helper_nodes
+            self.move_totals[ST_NODES] += helper_nodes
+            main_depth = self.depth_stats[-1]['depth'] if self.depth_stats else 0
+            if helper_best is not None and helper_best[0] > main_depth:
+                best_move = self.to_move(me, opp, helper_best[2])
+        return best_move
+
+    def split_deepen(self, me, opp, depth):
+        # 根结点并行的迭代加深：每轮按上一轮的得分从高到低排列根走步
+        if self.splitter is None or self.splitter.workers != self.root_split_workers:
+            if self.splitter is not None:
+                self.splitter.close()
+            self.update_config()
+            self.splitter = RootSplitter(self.root_split_workers, self.cfg)
+        self.update_config()
+        moves = sorted(iter_bits(get_moves(me, opp)), key=lambda sq: -WEIGHT_MATRIX[sq >> 3, sq & 7])
         best_move = None
-        while True:
-            eval = self.evaluate_board(board)
-            try:
-                self.count = 0
-                score, move = self.minimax(board, depth, -float('inf'), float('inf'), True, start_time, time_limit, eval)
-                if move is not None:
-                    best_move = move
-                depth += 1
-            except TimeoutError:
+        self.depth_stats = []
+        self.count = 0
+        if not moves:
+            # 无子可下，与 deepen 一样返回 None
+            return best_move
+        while depth < MAX_PLY:
+            start = time.perf_counter()
+            result = self.splitter.search(me, opp, moves, depth, self.generation, self.cfg, self.stop)
+            if result is None:
+                self.depth_aborted = depth
                 break
-            if time.time() - start_time > time_limit:
+            scores, sq, score, resolved, nodes = result
+            self.count += nodes
+            self.move_totals[ST_NODES] += nodes
+            self.depth_stats.append({'depth': depth, 'score': int(score), 'nodes': nodes,
+                                     'seconds': round(time.perf_counter() - start, 6)})
+            best_move = self.to_move(me, opp, sq)
+            moves.sort(key=lambda m: (m != sq, -scores[m]))
+            if resolved or not self.timeman.iteration_done(nodes, sq):
                 break
+            depth += 1
+        return best_move
+
+    def solve_endgame(self, me, opp, depth):
+        # 先用一部分时间做普通的迭代加深保底，再求胜负和，最后求精确子数差；超时则返回已完成阶段的结果
+        empties = 64 - popcount(me | opp)
+        saved = self.timeman.limit(ENDGAME_SEARCH_FRACTION)
+        best_move = self.deepen(me, opp, min(depth, empties))
+        self.timeman.restore(saved)
+        if best_move is None or self.stop[0]:
+            return best_move
+        self.stats[:] = 0
+        start = time.perf_counter()
+        wld, sq = solve_root(me, opp, -1, 1, self.stop, self.stats, self.move_buf)
+        self.count = self.stats[ST_NODES]
+        self.move_totals += self.stats
+        if self.stop[0]:
+            self.depth_aborted = empties
+            return best_move
+        # 残局求解的两个阶段也记入 depth_stats，depth 为空格数，score 为子数差（胜负和阶段只有符号有意义）
+        self.depth_stats.append({'depth': empties, 'solve': 'wld', 'score': int(wld), 'nodes': int(self.count),
+                                 'seconds': round(time.perf_counter() - start, 6)})
+        # 全部走步都输（fail low）时 sq 只是上界最好的一步，不代表输得最少，保留保底搜索的走步
+        if wld >= 0:
+            best_move = self.to_move(me, opp, sq)
+        if wld == 0:
+            return best_move
+        lo, hi = (0, 65) if wld > 0 else (-65, 0)
+        self.stats[:] = 0
+        start = time.perf_counter()
+        score, sq = solve_root(me, opp, lo, hi, self.stop, self.stats, self.move_buf)
+        self.count = self.stats[ST_NODES]
+        self.move_totals += self.stats
+        if self.stop[0]:
+            self.depth_aborted = empties
+            return best_move
+        self.depth_stats.append({'depth': empties, 'solve': 'exact', 'score': int(score), 'nodes': int(self.count),
+                                 'seconds': round(time.perf_counter() - start, 6)})
+        if sq >= 0 and score > lo:
+            best_move = self.to_move(me, opp, sq)
+        return best_move
+
+    def start_pondering(self, me, opp, best_move):
+        # me/opp 为走子前的局面；走完 best_move 后对方的应对在 Ponderer 中预测
+        (row, col), flips, _ = best_move
+        me, opp = me | flips | (1 << (row * 8 + col)), opp ^ flips
+        if 64 - popcount(me | opp) - 1 <= self.endgame_empties:
+            # 残局求解不使用置换表，后台思考没有用处
+            return
+        if self.ponderer is None:
+            self.ponderer = Ponderer()
+        self.update_config()
+        # 后台思考的结果属于下一步，使用下一步的 generation
+        self.ponderer.start(me, opp, self.tt_keys, self.tt_vals, self.generation + 1, self.cfg)
+
+    def stop_pondering(self, me, opp):
+        if self.ponderer is None:
+            return None
+        return self.ponderer.finish(me, opp)
+
+    def warm_up(self):
+        # 可选，由评测程序在开始计时之前调用：内核在导入时已经编译（或从磁盘缓存加载），这里建立辅助线程的数组
+        # 和进程池，让置换表的内存页真正分配下来，并把搜索完整地跑一遍；结束后清空搜索状态，不影响第一步
+        if self.threads > 1 and self.smp is None:
+            self.smp = LazySMP(self.threads - 1)
+        if self.root_split_workers > 0 and self.splitter is None:
+            self.splitter = RootSplitter(self.root_split_workers, self.cfg)
+        if self.ponder and self.ponderer is None:
+            self.ponderer = Ponderer()
+        self.stop[0] = 0
+        self.tt_keys.fill(0)
+        self.tt_vals.fill(0)
+        self.minimax(START_BLACK, START_WHITE, WARM_UP_DEPTH)
+        self.tt_keys.fill(0)
+        self.tt_vals.fill(0)
+        self.stats[:] = 0
+        self.killers.fill(NO_MOVE)
+        self.history.fill(0)
+
+    def record_telemetry(self, mode, empties, best_move, start, score=None, depth=0):
+        # 由本步的 depth_stats 与 move_totals 生成 self.telemetry；score/depth 用于没有迭代记录的情况（开局库）
+        last = self.depth_stats[-1] if self.depth_stats else None
+        totals = self.move_totals
+        self.telemetry = MoveTelemetry(
+            round=self.round, color=self.color, empties=empties, mode=mode,
+            move=None if best_move is None else (int(best_move[0][0]), int(best_move[0][1])),
+            score=last['score'] if last else score,
+            seconds=time.perf_counter() - start,
+            nodes=int(totals[ST_NODES]),
+            leaf_evals=int(totals[ST_EVALS]),
+            cutoffs=int(totals[ST_CUTOFFS]),
+            first_cutoffs=int(totals[ST_FIRST_CUTOFFS]),
+            tt_probes=int(totals[ST_TT_PROBES]),
+            tt_hits=int(totals[ST_TT_HITS]),
+            depth_completed=last['depth'] if last else depth,
+            depth_aborted=self.depth_aborted,
+            iterations=self.depth_stats)
+        if self.telemetry_path is not None:
+            if self.telemetry_log is None:
+                self.telemetry_log = TelemetryLog(self.telemetry_path)
+            self.telemetry_log.write(self.telemetry)
+
+    def record_profile(self, start, movegen_end):
+        # go() 的时间记入 self.profile：走步生成与本步的搜索（按 telemetry 的 mode 区分）直接计时，
+        # 搜索内部再由 negamax 的采样结点估计各阶段
+        totals = self.move_totals
+        search = self.telemetry.seconds
+        self.profile.add('go;generate_move_mask', movegen_end - start)
+        self.profile.add_search('go;' + self.telemetry.mode, search, int(totals[ST_PROF_SAMPLES]),
+                                totals[ST_PROF::2], totals[ST_PROF + 1::2])
+        self.profile.add('go', max(time.perf_counter() - movegen_end - search, 0.0))
+
+    def close(self):
+        # 停止后台线程与进程池，一局结束后调用
+        if self.ponderer is not None:
+            self.ponderer.finish(0, 0)
+        if self.splitter is not None:
+            self.splitter.close()
+            self.splitter = None
+        if self.telemetry_log is not None:
+            self.telemetry_log.close()
+            self.telemetry_log = None
+
+    def iterative_deepening(self, board):
+        start = time.perf_counter()
+        depth = 5 if self.round <= 24 else 7
+        me, opp = board_to_bitboards(as_board(board), self.color)
+        empties = 64 - popcount(me | opp)
+        self.move_totals[:] = 0
+        self.depth_aborted = 0
+        self.ponder_hit = self.stop_pondering(me, opp)
+        if self.use_book and self.book is not None:
+            hit = self.book.probe(me, opp)
+            if hit is not None:
+                self.depth_stats = []
+                best_move = self.to_move(me, opp, hit[0])
+                self.record_telemetry('book', empties, best_move, start, hit[1], hit[2])
+                return best_move
+        self.timeman.start(empties, self.time_limit)
+        self.generation += 1
+        # 上一步的 killer 对应的层数已经错开，history 只保留一部分
+        self.killers.fill(NO_MOVE)
+        self.history >>= 2
+        self.stop[0] = 0
+        timer = threading.Timer(self.timeman.remaining(), self.stop.fill, (1,))
+        timer.start()
+        try:
+            if empties <= self.endgame_empties:
+                mode = 'endgame'
+                best_move = self.solve_endgame(me, opp, depth)
+            elif self.root_split_workers > 0:
+                mode = 'split'
+                best_move = self.split_deepen(me, opp, depth)
+            elif self.ponder_hit is not None:
+                # 命中：从后台思考完成的深度之后继续
+                mode = 'ponder'
+                ponder_depth, score, sq = self.ponder_hit
+                best_move = self.deepen(me, opp, max(depth, ponder_depth + 1), self.to_move(me, opp, sq), score)
+            else:
+                mode = 'search'
+                best_move = self.deepen(me, opp, depth)
+        finally:
+            timer.cancel()
+        self.record_telemetry(mode, empties, best_move, start)
+        if self.ponder and best_move is not None:
+            self.start_pondering(me, opp, best_move)
         return best_move
 
     def go(self, chessboard):
         self.candidate_list.clear()
-        start_time = time.time()
         self.round += 1
-        valid_moves = self.generate_valid_moves(chessboard, self.color)
-        valid_moves.sort(key=lambda move: move[2])
-        for move in valid_moves:
-            self.candidate_list.append(move[0])
+        start = time.perf_counter()
+        chessboard = as_board(chessboard)
+        # 候选列表只需要走步的位置，不计算翻转
+        _, _, moves = self.generate_move_mask(chessboard, self.color)
+        movegen_end = time.perf_counter()
+        self.candidate_list.extend(self.candidate_squares(moves))
         best_move = self.iterative_deepening(chessboard)
+        if self.profile is not None:
+            self.record_profile(start, movegen_end)
         if best_move is None:
             return []
         chosen_pos = best_move[0]
         self.candidate_list.append(chosen_pos)
-        self.total_time_used += time.time() - start_time
+        self.total_time_used += time.perf_counter() - start
         self.move_count += 1
         return self.candidate_list
@@ -0,0 +1,85 @@
+import numpy as np
+import numba
+from bitboard import U, lsb_index
+from evaluate import WEIGHT_MATRIX
+
+SQUARE_WEIGHT = WEIGHT_MATRIX.reshape(64)
+
+# 排序键（越大越先搜）：置换表走步 > 两个 killer > history 分数 > WEIGHT_MATRIX（己方降序，对方升序）。
+# move_buf 中存 key * 64 + (63 - sq)，键相同时按格子编号升序
+TIER_HASH = 3 << 40
+TIER_KILLER1 = 2 << 40
+TIER_KILLER2 = 1 << 40
+HISTORY_SHIFT = 5       # history 分数左移后再加上 0 ~ 16 的格子权重
+HISTORY_MAX = 1 << 30   # 超过时整张表减半
+
+NO_MOVE = -1
+
+
+def new_ordering(max_ply):
+    # killers[ply] 为该层最近两个产生截断的走步，history[s, sq] 为走子方 s（0 为 AI）在 sq 上的截断得分
+    killers = np.full((max_ply, 2), NO_MOVE, dtype=np.int64)
+    history = np.zeros((2, 64), dtype=np.int64)
+    return killers, history
+
+
+@numba.njit('int64(int64)', nogil=True, inline='always', cache=True)
+def move_sq(v):
+    return 63 - (v & 63)
+
+
+@numba.njit('int64(uint64, int64, int64[:, :], int64, int64, int64[:, :], int64[:, :])', nogil=True, cache=True)
+def order_moves(moves, ply, move_buf, side, hash_move, killers, history):
+    # 把位掩码 moves 中的走步写入 move_buf[ply] 并按键降序插入排序，返回走步数；用 move_sq 取出格子编号。
+    # killers 全为 NO_MOVE、history 全为 0 时退化为只按 WEIGHT_MATRIX 排序
+    s = 0 if side == 1 else 1
+    n = 0
+    while moves:
+        sq = lsb_index(moves)
+        moves &= moves - U(1)
+        if sq == hash_move:
+            key = TIER_HASH
+        elif sq == killers[ply, 0]:
+            key = TIER_KILLER1
+        elif sq == killers[ply, 1]:
+            key = TIER_KILLER2
+        else:
+            key = (history[s, sq] << HISTORY_SHIFT) + SQUARE_WEIGHT[sq] * side + 8
+        v = key * 64 + 63 - sq
+        j = n
+        while j > 0 and move_buf[ply, j - 1] < v:
+            move_buf[ply, j] = move_buf[ply, j - 1]
+            j -= 1
+        move_buf[ply, j] = v
+        n += 1
+    return n
+
+
+@numba.njit('void(int64[:, :], int64, int64)', nogil=True, cache=True)
+def add_killer(killers, ply, sq):
+    # 走步 sq 在 ply 层产生了 beta 截断
+    if killers[ply, 0] != sq:
+        killers[ply, 1] = killers[ply, 0]
+        killers[ply, 0] = sq
+
+
+@numba.njit('void(int64[:, :], int64, int64, int64)', nogil=True, cache=True)
+def add_history(history, side, sq, depth):
+    s = 0 if side == 1 else 1
+    history[s, sq] += depth * depth
+    if history[s, sq] > HISTORY_MAX:
+        for i in range(2):
+            for j in range(64):
+                history[i, j] >>= 1
+
+
+@numba.njit('void(int64[:, :], int64, int64, int64)', nogil=True, cache=True)
+def move_to_front(move_buf, ply, n, sq):
+    for i in range(n):
+        if move_sq(move_buf[ply, i]) == sq:
+            v = move_buf[ply, i]
+            while i > 0:
+                move_buf[ply, i] = move_buf[ply, i - 1]
+                i -= 1
+            move_buf[ply, 0] = v
+            return
@@ -0,0 +1,168 @@
+import os
+
+import numpy as np
+import numba
+from bitboard import U, lsb_index
+from symmetry import SYM_SQ
+
+# 模式估值：每个模式为一组格子，格子状态（0 空、1 AI、2 对方）按三进制组成下标，查表得到估值。
+# 同一种模式在棋盘上的各个对称位置共用一张表。基准位置的格子按 (row, col) 给出
+PATTERN_TYPES = [
+    ('corner3x3', [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)]),
+    ('corner2x5', [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0), (1, 1), (1, 2), (1, 3), (1, 4)]),
+    ('edge2x', [(0, c) for c in range(8)] + [(1, 1), (1, 6)]),
+    ('row2', [(1, c) for c in range(8)]),
+    ('row3', [(2, c) for c in range(8)]),
+    ('row4', [(3, c) for c in range(8)]),
+    ('diag8', [(i, i) for i in range(8)]),
+    ('diag7', [(i, i + 1) for i in range(7)]),
+    ('diag6', [(i, i + 2) for i in range(6)]),
+    ('diag5', [(i, i + 3) for i in range(5)]),
+    ('diag4', [(i, i + 4) for i in range(4)]),
+]
+MAX_CELLS = 10
+POW3 = 3 ** np.arange(MAX_CELLS + 1, dtype=np.int64)
+
+EMPTY = 0
+AI_STATE = 1
+OPP_STATE = 2
+
+
+def _instances():
+    # 把每种模式的基准格子施加 8 种对称，去掉格子集合相同的重复位置
+    cells, types = [], []
+    for t, (_, base) in enumerate(PATTERN_TYPES):
+        seen = set()
+        for s in range(8):
+            sqs = [int(SYM_SQ[s, r * 8 + c]) for r, c in base]
+            if frozenset(sqs) not in seen:
+                seen.add(frozenset(sqs))
+                cells.append(sqs)
+                types.append(t)
+    n = len(cells)
+    pat_cells = np.full((n, MAX_CELLS), -1, dtype=np.int64)
+    pat_len = np.zeros(n, dtype=np.int64)
+    pat_mask = np.zeros(n, dtype=np.uint64)
+    pat_pow = np.zeros((n, 64), dtype=np.int64)
+    for i, sqs in enumerate(cells):
+        pat_len[i] = len(sqs)
+        pat_cells[i, :len(sqs)] = sqs
+        for k, sq in enumerate(sqs):
+            pat_mask[i] |= np.uint64(1 << sq)
+            pat_pow[i, sq] = POW3[k]
+    type_offset = np.zeros(len(PATTERN_TYPES) + 1, dtype=np.int64)
+    for t, (_, base) in enumerate(PATTERN_TYPES):
+        type_offset[t + 1] = type_offset[t] + POW3[len(base)]
+    pat_offset = type_offset[np.array(types)]
+    return pat_cells, pat_len, pat_mask, pat_pow, pat_offset, type_offset, np.array(types, dtype=np.int64)
+
+
+# PAT_CELLS[i, k]：第 i 个模式位置的第 k 个格子（三进制第 k 位），PAT_POW[i, sq]：格子 sq 所在位的权 3^k
+PAT_CELLS, PAT_LEN, PAT_MASK, PAT_POW, PAT_OFFSET, TYPE_OFFSET, PAT_TYPE = _instances()
+N_PATTERNS = PAT_CELLS.shape[0]
+N_WEIGHTS = int(TYPE_OFFSET[-1])
+
+
+def _canonical_index():
+    # 有的模式在某些对称下映射到自身（corner3x3 的转置、edge2x 与 row2~4 的左右翻转、diag8 的转置），
+    # 同一组格子按不同的顺序读出的下标对应对称的局面，必须取同一个权重，估值才在 8 种对称下不变。
+    # CANON_INDEX[k] 为权重下标 k 在这些重排下的最小下标
+    canon = np.arange(N_WEIGHTS, dtype=np.int64)
+    for t, (_, base) in enumerate(PATTERN_TYPES):
+        sqs = [r * 8 + c for r, c in base]
+        n = len(sqs)
+        best = np.arange(int(POW3[n]), dtype=np.int64)
+        digits = (best[:, None] // POW3[:n]) % 3
+        for s in range(8):
+            mapped = [int(SYM_SQ[s, sq]) for sq in sqs]
+            if set(mapped) != set(sqs):
+                continue
+            # 第 k 位的格子在对称后落在第 perm[k] 位
+            perm = [sqs.index(sq) for sq in mapped]
+            best = np.minimum(best, digits @ POW3[perm])
+        canon[TYPE_OFFSET[t]:TYPE_OFFSET[t + 1]] = TYPE_OFFSET[t] + best
+    return canon.astype(np.int32)    # int32：numba 不缓存引用超过 1MB 全局数组的内核
+
+
+CANON_INDEX = _canonical_index()
+
+
+def symmetrize(weights):
+    # 对称的下标取平均，得到在 8 种对称下不变的权重表
+    total = np.bincount(CANON_INDEX, weights=weights, minlength=N_WEIGHTS)
+    count = np.bincount(CANON_INDEX, minlength=N_WEIGHTS)
+    return np.round(total[CANON_INDEX] / count[CANON_INDEX]).astype(weights.dtype)
+
+
+# 权重文件：8 字节文件头之后是 N_WEIGHTS 个 int32，由 train.py 拟合得到
+WEIGHTS_MAGIC = b'RRWGHT1\0'
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weights.bin')
+
+
+def write_weights(path, weights):
+    with open(path, 'wb') as f:
+        f.write(WEIGHTS_MAGIC)
+        np.asarray(weights, dtype='<i4').tofile(f)
+
+
+def load_weights(path=WEIGHTS_PATH):
+    # 没有权重文件时返回全 0 的表；读入的表经过 symmetrize，保证估值对称
+    if not os.path.exists(path):
+        return np.zeros(N_WEIGHTS, dtype=np.int32)
+    with open(path, 'rb') as f:
+        if f.read(len(WEIGHTS_MAGIC)) != WEIGHTS_MAGIC:
+            raise ValueError('not a weights file: ' + path)
+        weights = np.fromfile(f, dtype='<i4')
+    if len(weights) != N_WEIGHTS:
+        raise ValueError('weights file %s has %d entries, expected %d' % (path, len(weights), N_WEIGHTS))
+    return symmetrize(weights.astype(np.int32))
+
+
+# 权重表在导入时读入（numba 把它当作常量编译进内核）；全为 0 时估值与原来的 evaluate_board_numb 相同，
+# 并且跳过模式计算
+PATTERN_WEIGHTS = load_weights()
+PATTERNS_ENABLED = bool(PATTERN_WEIGHTS.any())
+
+
+@numba.njit('int64(uint64, uint64, int64)', nogil=True, cache=True)
+def pattern_index(ai, op, i):
+    idx = 0
+    for k in range(PAT_LEN[i]):
+        c = U(PAT_CELLS[i, k])
+        idx += POW3[k] * np.int64(((ai >> c) & U(1)) + U(2) * ((op >> c) & U(1)))
+    return idx
+
+
+@numba.njit('int64(uint64, uint64)', nogil=True, cache=True)
+def evaluate_patterns(ai, op):
+    # ai/op 为 AI 一方与对方的子
+    score = 0
+    if not PATTERNS_ENABLED:
+        return score
+    for i in range(N_PATTERNS):
+        score += PATTERN_WEIGHTS[PAT_OFFSET[i] + pattern_index(ai, op, i)]
+    return score
+
+
+@numba.njit('int64(uint64, uint64, int64, uint64, uint64)', nogil=True, cache=True)
+def pattern_delta(ai, op, side, changed, placed):
+    # side 一方走子后模式估值的变化量：changed 为落子格与翻转格，placed 为落子格；ai/op 为走子前的局面。
+    # 只重新计算与 changed 相交的模式
+    if not PATTERNS_ENABLED:
+        return 0
+    mover = AI_STATE if side == 1 else OPP_STATE
+    delta = 0
+    for i in range(N_PATTERNS):
+        m = PAT_MASK[i] & changed
+        if m == 0:
+            continue
+        idx = pattern_index(ai, op, i)
+        new = idx
+        while m:
+            sq = lsb_index(m)
+            bit = m & (~m + U(1))
+            m ^= bit
+            old = EMPTY if bit & placed else 3 - mover
+            new += PAT_POW[i, sq] * (mover - old)
+        delta += PATTERN_WEIGHTS[PAT_OFFSET[i] + new] - PATTERN_WEIGHTS[PAT_OFFSET[i] + idx]
+    return delta
@@ -0,0 +1,380 @@
+import argparse
+import importlib
+import random
+import sys
+import time
+
+import numba
+import numpy as np
+
+from bitboard import (U, COLOR_BLACK, START_BLACK, START_WHITE, get_moves, get_flips, popcount, lsb_index,
+                      board_to_bitboards, bitboards_to_board, iter_bits)
+
+# 初始局面的标准 perft 结果：让步计为一步，双方都无子可下的终局结点计为一个叶结点
+REFERENCE = {
+    1: 4,
+    2: 12,
+    3: 56,
+    4: 244,
+    5: 1396,
+    6: 8200,
+    7: 55092,
+    8: 390216,
+    9: 3005288,
+    10: 24571284,
+    11: 212258800,
+}
+
+GENERATORS = ['bitboard', 'main', 'ver2', 'ver1', 'ver6', 'main5']
+
+
+@numba.njit('int64(uint64, uint64, int64, boolean)', cache=True)
+def perft_bb(P, O, depth, passed):
+    if depth == 0:
+        return 1
+    moves = get_moves(P, O)
+    if moves == 0:
+        if passed:
+            return 1
+        # 布尔常量写成 np.bool_ 的原因见 search.negamax
+        return perft_bb(O, P, depth - 1, np.bool_(True))
+    if depth == 1:
+        n = 0
+        while moves:
+            moves &= moves - U(1)
+            n += 1
+        return n
+    total = 0
+    while moves:
+        sq = lsb_index(moves)
+        moves &= moves - U(1)
+        flips = get_flips(P, O, sq)
+        total += perft_bb(O ^ flips, P | flips | (U(1) << U(sq)), depth - 1, np.bool_(False))
+    return total
+
+
+def _mask(squares):
+    m = 0
+    for r, c in squares:
+        m |= 1 << (int(r) * 8 + int(c))
+    return m
+
+
+def _scan(flips_fn):
+    # 在每个空格上调用 flips_fn，得到 [(sq, flips_mask)]
+    def moves(board, color):
+        result = []
+        for row in range(8):
+            for col in range(8):
+                if board[row, col] == 0:
+                    flips = _mask(flips_fn(board, row, col, color))
+                    if flips:
+                        result.append((row * 8 + col, flips))
+        return result
+    return moves
+
+
+def generator(name):
+    # 返回 moves(board, color) -> [(sq, flips_mask)]，board 为 NumPy 棋盘
+    if name == 'bitboard':
+        def moves(board, color):
+            P, O = board_to_bitboards(board, color)
+            return [(sq, get_flips(P, O, sq)) for sq in iter_bits(get_moves(P, O))]
+        return moves
+    if name == 'main':
+        main = importlib.import_module('main')
+        return _scan(lambda b, r, c, color: main.get_flips_numb(b, r, c, color, 8))
+    if name == 'ver2':
+        ver2 = importlib.import_module('ver2')
+        return _scan(lambda b, r, c, color: ver2.get_flips_numba(b, r, c, color, 8))
+    if name == 'main5':
+        # ReversiGame.wk 直接在棋盘上落子翻转，不需要 pygame 窗口，所以不调用 __init__
+        main5 = importlib.import_module('main5')
+        game = main5.ReversiGame.__new__(main5.ReversiGame)
+
+        def wk_flips(board, row, col, color):
+            after = board.copy()
+            game.wk(after, (row, col), color)
+            changed = np.argwhere(after != board)
+            return [(r, c) for r, c in changed if (r, c) != (row, col)]
+        return _scan(wk_flips)
+    # verN：使用该版本 AI.get_flips 的纯 Python 实现
+    ai = importlib.import_module(name).AI(8, COLOR_BLACK, 5)
+    return _scan(ai.get_flips)
+
+
+def engine_generator(module):
+    # 使用引擎自己的 generate_valid_moves（没有时退回到 get_flips）
+    ai = module.AI(8, COLOR_BLACK, 5)
+    if not hasattr(ai, 'generate_valid_moves'):
+        return _scan(ai.get_flips)
+
+    def moves(board, color):
+        result = []
+        for (row, col), flips, _ in ai.generate_valid_moves(board, color):
+            if not isinstance(flips, (int, np.integer)):
+                flips = _mask(flips)
+            result.append((row * 8 + col, int(flips)))
+        return result
+    return moves
+
+
+def play(board, sq, flips, color):
+    board = board.copy()
+    board[sq >> 3, sq & 7] = color
+    for f in iter_bits(flips):
+        board[f >> 3, f & 7] = color
+    return board
+
+
+def perft_board(moves_fn, board, color, depth, passed=False):
+    if depth == 0:
+        return 1
+    moves = moves_fn(board, color)
+    if not moves:
+        if passed:
+            return 1
+        return perft_board(moves_fn, board, -color, depth - 1, True)
+    return sum(perft_board(moves_fn, play(board, sq, flips, color), -color, depth - 1)
+               for sq, flips in moves)
+
+
+def compare_generators(names, board, color, depth, passed=False):
+    # 在 perft 树的每个结点上比较各生成器的走步与翻转；返回第一个不一致处的描述，全部一致时返回 None
+    fns = [generator(name) for name in names]
+    stack = [(board, color, depth, passed)]
+    while stack:
+        b, c, d, p = stack.pop()
+        if d == 0:
+            continue
+        results = [sorted(fn(b, c)) for fn in fns]
+        for name, r in zip(names[1:], results[1:]):
+            if r != results[0]:
+                return '%s disagrees with %s (color %d):\n%s' % (name, names[0], c, b)
+        if not results[0]:
+            if not p:
+                stack.append((b, -c, d - 1, True))
+            continue
+        for sq, flips in results[0]:
+            stack.append((play(b, sq, flips, c), -c, d - 1, False))
+    return None
+
+
+@numba.njit('int64(uint64, uint64, boolean)', cache=True)
+def brute_force(P, O, passed):
+    # 不剪枝的完整极小极大搜索，返回走子一方的终局子数差（对方 - 己方），用来核对残局求解
+    moves = get_moves(P, O)
+    if moves == 0:
+        if passed:
+            return popcount(O) - popcount(P)
+        return -brute_force(O, P, np.bool_(True))
+    best = -64
+    while moves:
+        sq = lsb_index(moves)
+        moves &= moves - U(1)
+        flips = get_flips(P, O, sq)
+        score = -brute_force(O ^ flips, P | flips | (U(1) << U(sq)), np.bool_(False))
+        if score > best:
+            best = score
+    return best
+
+
+def random_position(rng, empties):
+    # 从初始局面随机下到剩 empties 个空格，返回走子一方有子可下的 (P, O)；提前终局时返回 None
+    P, O = START_BLACK, START_WHITE
+    while 64 - popcount(P | O) > empties:
+        if not get_moves(P, O):
+            P, O = O, P
+            if not get_moves(P, O):
+                return None
+        sq = rng.choice(list(iter_bits(get_moves(P, O))))
+        flips = get_flips(P, O, sq)
+        P, O = O ^ flips, P | flips | (1 << sq)
+    if not get_moves(P, O):
+        P, O = O, P
+    return (P, O) if get_moves(P, O) else None
+
+
+def check_endgame(positions, seed=0, empties=(5, 10)):
+    # 残局求解与 brute_force 比较精确得分；返回不一致的局面 [(P, O, solver, expected)]
+    from endgame import solve_root
+    from search import new_buffers, INF
+    _, _, _, stop, stats, move_buf, _, _ = new_buffers()
+    rng = random.Random(seed)
+    errors = []
+    n = 0
+    while n < positions:
+        pos = random_position(rng, rng.randint(*empties))
+        if pos is None:
+            continue
+        n += 1
+        P, O = pos
+        stop[0] = 0
+        score, _ = solve_root(P, O, -INF, INF, stop, stats, move_buf)
+        expected = brute_force(P, O, False)
+        if score != expected:
+            errors.append((P, O, score, expected))
+    return errors
+
+
+def check_incremental(games, seed=0):
+    # 随机对局中逐步 make / make_pass，核对增量维护的估值和 hash 与重新计算的结果一致，
+    # 再全部 unmake 回到初始局面；返回第一处不一致的描述，全部一致时返回 None
+    from evaluate import evaluate_bb
+    from position import new_position, play, make_pass, unmake, BB_P, BB_O, BB_HASH, POS_SIDE, POS_EVAL, POS_SP
+    from tt import zobrist_hash
+    rng = random.Random(seed)
+    for game in range(games):
+        bb, st, undo = new_position(START_BLACK, START_WHITE)
+        history = []
+        while True:
+            P, O = int(bb[BB_P]), int(bb[BB_O])
+            moves = get_moves(P, O)
+            if not moves and not get_moves(O, P):
+                break
+            history.append((P, O, int(bb[BB_HASH]), int(st[POS_SIDE]), int(st[POS_EVAL])))
+            if moves:
+                play(bb, st, undo, rng.choice(list(iter_bits(moves))))
+            else:
+                make_pass(bb, st, undo)
+            P, O, side = int(bb[BB_P]), int(bb[BB_O]), int(st[POS_SIDE])
+            ai, op = (P, O) if side == 1 else (O, P)
+            if st[POS_EVAL] != evaluate_bb(ai, op) or int(bb[BB_HASH]) != zobrist_hash(P, O, side):
+                return 'game %d ply %d: incremental eval/hash differs from evaluate_bb/zobrist_hash' % (
+                    game, len(history))
+        while st[POS_SP] > 0:
+            unmake(bb, st, undo)
+            if history.pop() != (int(bb[BB_P]), int(bb[BB_O]), int(bb[BB_HASH]), int(st[POS_SIDE]),
+                                 int(st[POS_EVAL])):
+                return 'game %d ply %d: unmake does not restore the position' % (game, len(history))
+    return None
+
+
+def reference_negamax(P, O, side, depth, passed=False):
+    # 与 search.negamax 相同的叶结点估值（side 为走子方是否为 AI），不剪枝、不使用置换表
+    from evaluate import evaluate_bb, mobility_score
+    moves = get_moves(P, O)
+    if depth == 0 or (not moves and passed):
+        ai, op = (P, O) if side == 1 else (O, P)
+        return evaluate_bb(ai, op) * side + mobility_score(P, O)
+    if not moves:
+        return -reference_negamax(O, P, -side, depth - 1, True)
+    best = None
+    for sq in iter_bits(moves):
+        flips = get_flips(P, O, sq)
+        score = -reference_negamax(O ^ flips, P | flips | (1 << sq), -side, depth - 1)
+        if best is None or score > best:
+            best = score
+    return best
+
+
+def check_search(positions, depth=5, symmetry=True, seed=0, plies=4):
+    # 从初始局面随机走 plies 步的局面上逐层加深，最后一层的根得分与 reference_negamax 比较；symmetry 控制
+    # 对称局面是否共用置换表项。置换表在各局面之间保留，不同局面中对称的结点由此互相命中；
+    # 所有局面的步数相同，同一结点要求的剩余深度也相同，不会复用更深的结果（那样的得分与固定深度的
+    # minimax 本来就不同）。返回不一致的局面 [(P, O, score, expected)]
+    import main
+    ai = main.AI(8, COLOR_BLACK, 5)
+    ai.use_symmetry = symmetry
+    rng = random.Random(seed)
+    errors = []
+    n = 0
+    while n < positions:
+        pos = random_position(rng, 60 - plies)
+        if pos is None:
+            continue
+        n += 1
+        P, O = pos
+        ai.stop[0] = 0
+        for d in range(1, depth + 1):
+            score, _ = ai.minimax(P, O, d)
+        expected = reference_negamax(P, O, 1, depth)
+        if score != expected:
+            errors.append((P, O, score, expected))
+    return errors
+
+
+def start_board():
+    return bitboards_to_board(START_BLACK, START_WHITE, COLOR_BLACK)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perft move-generator validator and speed test.')
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--check', type=int, default=9, help='check bitboard perft against REFERENCE up to this depth')
+    parser.add_argument('--generators', nargs='+', default=GENERATORS)
+    parser.add_argument('--compare-depth', type=int, default=4,
+                        help='node-by-node comparison depth on every corpus position')
+    parser.add_argument('--endgame-positions', type=int, default=30,
+                        help='random 5-10 empty positions solved by endgame.solve_root and by brute force')
+    parser.add_argument('--playouts', type=int, default=50,
+                        help='random games checking the incremental eval/hash and unmake')
+    parser.add_argument('--search-positions', type=int, default=40,
+                        help='opening positions where the search (with symmetric TT entries) must match plain minimax')
+    parser.add_argument('--search-depth', type=int, default=5)
+    args = parser.parse_args()
+    ok = True
+
+    for depth in range(1, args.check + 1):
+        start = time.perf_counter()
+        n = perft_bb(START_BLACK, START_WHITE, depth, False)
+        elapsed = time.perf_counter() - start
+        status = 'ok' if n == REFERENCE.get(depth, n) else 'MISMATCH (expected %d)' % REFERENCE[depth]
+        ok = ok and status == 'ok'
+        print('perft(%d) = %d  %.3fs  %s' % (depth, n, elapsed, status))
+
+    names = []
+    for name in args.generators:
+        try:
+            generator(name)
+            names.append(name)
+        except ImportError as e:
+            print('skip %s: %s' % (name, e))
+
+    board = start_board()
+    print('%-10s %12s %10s %12s' % ('generator', 'nodes', 'seconds', 'nodes/sec'))
+    for name in names:
+        fn = generator(name)
+        fn(board, COLOR_BLACK)      # 预热（numba 编译）
+        start = time.perf_counter()
+        n = perft_board(fn, board, COLOR_BLACK, args.depth)
+        elapsed = time.perf_counter() - start
+        if n != REFERENCE.get(args.depth, n):
+            ok = False
+        print('%-10s %12d %10.3f %12d' % (name, n, elapsed, n / elapsed))
+
+    from bench import corpus
+    for pos_name, _, b, color in corpus():
+        diff = compare_generators(names, b, color, args.compare_depth)
+        if diff:
+            ok = False
+            print('%s: %s' % (pos_name, diff))
+    print('all generators agree' if ok else 'MISMATCH')
+
+    start = time.perf_counter()
+    errors = check_endgame(args.endgame_positions)
+    for P, O, score, expected in errors:
+        print('endgame MISMATCH: P=%#018x O=%#018x solver %d, brute force %d' % (P, O, score, expected))
+    print('endgame solver: %d/%d positions agree with brute force  %.1fs'
+          % (args.endgame_positions - len(errors), args.endgame_positions, time.perf_counter() - start))
+    ok = ok and not errors
+
+    diff = check_incremental(args.playouts)
+    if diff:
+        ok = False
+    print('incremental eval: ' + (diff or '%d playouts ok' % args.playouts))
+
+    from evaluate import EVAL_SYMMETRIC
+    start = time.perf_counter()
+    errors = check_search(args.search_positions, args.search_depth, EVAL_SYMMETRIC)
+    for P, O, score, expected in errors:
+        print('search MISMATCH: P=%#018x O=%#018x search %d, minimax %d' % (P, O, score, expected))
+    print('search (symmetric TT %s): %d/%d root scores agree with minimax  %.1fs'
+          % ('on' if EVAL_SYMMETRIC else 'off', args.search_positions - len(errors), args.search_positions,
+             time.perf_counter() - start))
+    ok = ok and not errors
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import threading
+
+from bitboard import get_moves, get_flips, iter_bits
+from smp import deepen_in_background
+from tt import zobrist_hash, tt_probe, tt_move
+from symmetry import INV_SQ, table_key
+from search import new_buffers, CFG_SYMMETRY
+from ordering import SQUARE_WEIGHT
+
+PONDER_DEPTH = 1
+
+
+def predict_reply(me, opp, tt_keys, tt_vals, symmetric=True):
+    # AI 走完之后轮到对方（me/opp 仍是 AI 一方和对方的子）：优先取置换表中的最佳应对，
+    # 没有时按 WEIGHT_MATRIX 取对方最喜欢的格子；对方无子可下时返回 -1
+    moves = get_moves(opp, me)
+    if not moves:
+        return -1
+    key, s = table_key(opp, me, -1, zobrist_hash(opp, me, -1), symmetric)
+    sq = tt_move(tt_probe(tt_keys, tt_vals, key))
+    if sq >= 0:
+        sq = int(INV_SQ[s, sq])
+        if (moves >> sq) & 1:
+            return sq
+    return min(iter_bits(moves), key=lambda x: SQUARE_WEIGHT[x])
+
+
+class Ponderer(object):
+    # 在对方思考时搜索“预测对方应对之后”的局面，结果写入共享的置换表。
+    # 下一次 go() 时先停止后台搜索：局面与预测一致（命中）时接着已完成的深度继续，否则丢弃结果
+    def __init__(self):
+        self.buffers = new_buffers()
+        self.stop = self.buffers[3]
+        self.thread = None
+        self.position = None
+        self.results = [None]
+        self.nodes = [0]
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, me, opp, tt_keys, tt_vals, gen, cfg):
+        # me/opp 为 AI 走完之后的局面；返回是否开始了后台搜索
+        reply = predict_reply(me, opp, tt_keys, tt_vals, cfg[CFG_SYMMETRY] != 0)
+        if reply >= 0:
+            flips = get_flips(opp, me, reply)
+            me, opp = me ^ flips, opp | flips | (1 << reply)
+        if not get_moves(me, opp):
+            return False
+        self.position = (me, opp)
+        self.results[0] = None
+        self.nodes[0] = 0
+        self.stop[0] = 0
+        self.thread = threading.Thread(target=deepen_in_background,
+                                       args=(self.buffers, me, opp, PONDER_DEPTH, self.stop, tt_keys, tt_vals,
+                                             gen, cfg, self.results, self.nodes, 0))
+        self.thread.daemon = True
+        self.thread.start()
+        return True
+
+    def finish(self, me, opp):
+        # 停止后台搜索；命中时返回最后完成的 (depth, score, sq)，未命中或没有完成的结果时返回 None
+        if self.thread is None:
+            return None
+        self.stop[0] = 1
+        self.thread.join()
+        self.thread = None
+        if self.position != (me, opp):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.results[0]
@@ -0,0 +1,93 @@
+import numpy as np
+import numba
+from bitboard import U, get_flips
+from evaluate import evaluate_bb, move_delta
+from tt import SIDE_KEY, zobrist_hash, update_hash
+
+# 一份可原地走子 / 悔棋的局面，undo 栈预先分配，走子过程中不再分配内存：
+#   bb    uint64[3]       走子方的子 P、对方的子 O、Zobrist hash
+#   st    int64[3]        side（1 表示 P 为 AI 一方）、估值（站在 AI 一方）、undo 栈顶
+#   undo  uint64[n, 3]    每一步的落子格（让步记为 PASS）、翻转掩码和走子前的 hash
+BB_P = 0
+BB_O = 1
+BB_HASH = 2
+POS_SIDE = 0
+POS_EVAL = 1
+POS_SP = 2
+
+PASS = 64
+MAX_GAME_PLY = 128     # 60 步棋加上让步
+
+
+def new_position(P, O, side=1, max_ply=MAX_GAME_PLY):
+    bb = np.zeros(3, dtype=np.uint64)
+    st = np.zeros(3, dtype=np.int64)
+    undo = np.zeros((max_ply, 3), dtype=np.uint64)
+    set_position(bb, st, P, O, side)
+    return bb, st, undo
+
+
+def set_position(bb, st, P, O, side=1):
+    ai, op = (P, O) if side == 1 else (O, P)
+    bb[BB_P] = P
+    bb[BB_O] = O
+    bb[BB_HASH] = zobrist_hash(P, O, side)
+    st[POS_SIDE] = side
+    st[POS_EVAL] = evaluate_bb(ai, op)
+    st[POS_SP] = 0
+
+
+@numba.njit('void(uint64[:], int64[:], uint64[:, :], int64, uint64)', nogil=True, cache=True)
+def make_move(bb, st, undo, sq, flips):
+    P = bb[BB_P]
+    O = bb[BB_O]
+    side = st[POS_SIDE]
+    bb[BB_P] = O ^ flips
+    bb[BB_O] = P | flips | (U(1) << U(sq))
+    sp = st[POS_SP]
+    undo[sp, 0] = U(sq)
+    undo[sp, 1] = flips
+    undo[sp, 2] = bb[BB_HASH]
+    st[POS_SP] = sp + 1
+    bb[BB_HASH] = update_hash(bb[BB_HASH], side, sq, flips)
+    st[POS_EVAL] += move_delta(P, O, side, sq, flips)
+    st[POS_SIDE] = -side
+
+
+@numba.njit(nogil=True, cache=True)
+def make_pass(bb, st, undo):
+    sp = st[POS_SP]
+    undo[sp, 0] = U(PASS)
+    undo[sp, 1] = U(0)
+    undo[sp, 2] = bb[BB_HASH]
+    st[POS_SP] = sp + 1
+    P = bb[BB_P]
+    bb[BB_P] = bb[BB_O]
+    bb[BB_O] = P
+    bb[BB_HASH] ^= SIDE_KEY
+    st[POS_SIDE] = -st[POS_SIDE]
+
+
+@numba.njit('void(uint64[:], int64[:], uint64[:, :])', nogil=True, cache=True)
+def unmake(bb, st, undo):
+    sp = st[POS_SP] - 1
+    st[POS_SP] = sp
+    sq = np.int64(undo[sp, 0])
+    side = -st[POS_SIDE]
+    st[POS_SIDE] = side
+    bb[BB_HASH] = undo[sp, 2]
+    P = bb[BB_P]
+    if sq == PASS:
+        bb[BB_P] = bb[BB_O]
+        bb[BB_O] = P
+        return
+    flips = undo[sp, 1]
+    bb[BB_P] = bb[BB_O] ^ flips ^ (U(1) << U(sq))
+    bb[BB_O] = P ^ flips
+    st[POS_EVAL] -= move_delta(bb[BB_P], bb[BB_O], side, sq, flips)
+
+
+@numba.njit(nogil=True, cache=True)
+def play(bb, st, undo, sq):
+    # 计算翻转后走子，供搜索以外的调用者使用
+    make_move(bb, st, undo, sq, get_flips(bb[BB_P], bb[BB_O], sq))
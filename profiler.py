@@ -0,0 +1,151 @@
+import time
+
+import jitcache  # noqa: F401  设置编译缓存目录，必须先于任何内核定义
+import numba
+from llvmlite import ir
+from numba import types
+from numba.core import cgutils
+from numba.extending import intrinsic
+
+# 搜索热路径的采样分析。内核里没法调用 Python 的计时器，用 CPU 周期计数器（llvm.readcyclecounter，
+# x86 上即 rdtsc）给几个阶段计时。打开 cfg[CFG_PROFILE] 后每 PROFILE_PERIOD 个结点采样一个，
+# 把该结点各阶段的周期数和计时次数累加到 stats 中；周期取奇数，避免与每 1024 个结点一次的 stop 检查对齐
+PROFILE_PERIOD = 17
+
+PH_STOP = 0         # stop 标志检查
+PH_TT = 1           # 置换表键、查询与写入
+PH_MOVEGEN = 2      # 生成走步位掩码
+PH_ORDER = 3        # 走步排序以及 killer / history 的更新
+PH_MAKE = 4         # 计算翻转、生成子结点局面与 hash
+PH_EVAL = 5         # 估值的增量更新
+N_PHASES = 6
+PHASE_NAMES = ('stop_check', 'tt', 'movegen', 'order', 'make', 'eval')
+
+
+@intrinsic
+def _readcyclecounter(typingctx):
+    def codegen(context, builder, signature, args):
+        fnty = ir.FunctionType(ir.IntType(64), [])
+        fn = cgutils.get_or_insert_function(builder.module, fnty, 'llvm.readcyclecounter')
+        return builder.call(fn, [])
+    return types.int64(), codegen
+
+
+@numba.njit('int64()', nogil=True, inline='always', cache=True)
+def cycles():
+    return _readcyclecounter()
+
+
+@numba.njit(nogil=True, cache=True)
+def _timer_overhead(n):
+    # 连续两次读计数器的最小差值，即每次计时本身带来的周期数
+    best = 1 << 40
+    for _ in range(n):
+        a = cycles()
+        b = cycles()
+        if b - a < best:
+            best = b - a
+    return best
+
+
+def calibrate(seconds=0.05):
+    # 返回 (每秒周期数, 每次计时的额外周期数)
+    start, c0 = time.perf_counter(), cycles()
+    while time.perf_counter() - start < seconds:
+        pass
+    rate = (cycles() - c0) / (time.perf_counter() - start)
+    return rate, _timer_overhead(10000)
+
+
+class SearchProfile(object):
+    # 累计若干次 go() 的分析结果（main.AI.profile）。Python 一侧的阶段直接用 perf_counter 计时；内核内的阶段
+    # 由采样结点的周期数放大，再换算成秒。内核阶段只覆盖主线程的 negamax，残局求解、辅助线程不在其中
+    def __init__(self):
+        self.rate, self.overhead = calibrate()
+        self.seconds = {}
+
+    def add(self, stack, seconds):
+        self.seconds[stack] = self.seconds.get(stack, 0.0) + seconds
+
+    def add_search(self, stack, seconds, samples, phase_cycles, phase_spans):
+        # stack 下的总时间为 seconds，其中按采样估计各阶段的时间，剩余部分（递归、循环和截断判断等）记在 stack 本身。
+        # 每 PROFILE_PERIOD 个结点采样一个，采样结点的周期数乘以 PROFILE_PERIOD 即为全部结点的估计
+        if samples:
+            scale = PROFILE_PERIOD
+            inside = 0.0
+            for k in range(N_PHASES):
+                c = max(int(phase_cycles[k]) - int(phase_spans[k]) * self.overhead, 0)
+                t = min(c * scale / self.rate, seconds - inside)
+                self.add(stack + ';' + PHASE_NAMES[k], t)
+                inside += t
+            seconds -= inside
+        self.add(stack, seconds)
+
+    def breakdown(self):
+        # 各栈自身时间（秒）与占比，按时间降序
+        total = sum(self.seconds.values())
+        rows = sorted(self.seconds.items(), key=lambda kv: -kv[1])
+        return [(stack, t, t / total if total else 0.0) for stack, t in rows]
+
+    def collapsed(self):
+        # flamegraph.pl / speedscope 可直接读取的折叠栈格式，计数单位为微秒
+        return '\n'.join('%s %d' % (stack, round(t * 1e6)) for stack, t in sorted(self.seconds.items())
+                         if round(t * 1e6) > 0)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            f.write(self.collapsed() + '\n')
+
+    def report(self):
+        return '\n'.join('%-40s %9.4fs %6.1f%%' % (stack, t, 100 * frac) for stack, t, frac in self.breakdown())
+
+
+def profile_game(time_limit=0.5, threads=1, seed=0):
+    # 两个 main.AI 自对弈一局（随机走 4 步开局），共用一个 SearchProfile
+    import main
+    from arena import play_opening, random_openings
+    from bitboard import COLOR_BLACK, COLOR_WHITE, get_moves, get_flips, bitboards_to_board
+    profile = SearchProfile()
+    ais = {}
+    for color in (COLOR_BLACK, COLOR_WHITE):
+        ai = main.AI(8, color, 5)
+        ai.time_limit = time_limit
+        ai.threads = threads
+        ai.warm_up()
+        ai.profile = profile
+        ais[color] = ai
+    black, white, color = play_opening(random_openings(1, 4, seed)[0])
+    while True:
+        P, O = (black, white) if color == COLOR_BLACK else (white, black)
+        if not get_moves(P, O):
+            if not get_moves(O, P):
+                break
+            color = -color
+            continue
+        move = ais[color].go(bitboards_to_board(black, white, COLOR_BLACK))[-1]
+        sq = int(move[0]) * 8 + int(move[1])
+        flips = get_flips(P, O, sq)
+        P, O = P | flips | (1 << sq), O ^ flips
+        black, white = (P, O) if color == COLOR_BLACK else (O, P)
+        color = -color
+    for ai in ais.values():
+        ai.close()
+    return profile
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Profile main.AI.go over one self-play game.')
+    parser.add_argument('--time-limit', type=float, default=0.5, help='per-move search time')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random 4-ply opening')
+    parser.add_argument('--out', help='write folded stacks (flamegraph.pl / speedscope input) here')
+    args = parser.parse_args()
+    profile = profile_game(args.time_limit, args.threads, args.seed)
+    print(profile.report())
+    if args.out:
+        profile.write(args.out)
+
+
+if __name__ == '__main__':
+    main()
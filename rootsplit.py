@@ -0,0 +1,114 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from bitboard import START_BLACK, START_WHITE, get_flips
+from search import negamax, new_buffers, INF, ST_NODES, ST_HORIZON
+from position import BB_P, BB_O, BB_HASH, POS_SIDE, POS_EVAL, set_position, make_move
+from tt import new_table, TT_SIZE_MB
+
+# 主进程与工作进程共享的 int64 数组：stop 标志、当前根结点的最好得分（即各子树搜索的 alpha）
+SHARED_STOP = 0
+SHARED_ALPHA = 1
+SHARED_SIZE = 2
+
+POLL_SECONDS = 0.005
+# 工作进程内的全局状态：共享数组、锁以及本进程自己的搜索数组和置换表
+_worker = {}
+
+
+def _init_worker(shared, lock):
+    flags = np.frombuffer(shared, dtype=np.int64)
+    bb, st, undo, _, stats, move_buf, killers, history = new_buffers()
+    tt_keys, tt_vals = new_table(TT_SIZE_MB)
+    _worker.update(flags=flags, stop=flags[SHARED_STOP:SHARED_STOP + 1], lock=lock, bb=bb, st=st, undo=undo,
+                   stats=stats, move_buf=move_buf, killers=killers, history=history,
+                   tt_keys=tt_keys, tt_vals=tt_vals)
+
+
+def search_move(me, opp, sq, depth, gen, cfg):
+    # 在工作进程中搜索根走步 sq 的子树，窗口下界取当前共享的最好得分。
+    # 返回 (sq, score, exact, horizon, nodes)：exact 为 False 时 score 只是上界，该走步不会比已有的更好
+    w = _worker
+    flags = w['flags']
+    bb, st, undo, stats = w['bb'], w['st'], w['undo'], w['stats']
+    stats[:] = 0
+    alpha = int(flags[SHARED_ALPHA])
+    set_position(bb, st, me, opp)
+    make_move(bb, st, undo, sq, get_flips(me, opp, sq))
+    score = -negamax(bb[BB_P], bb[BB_O], st[POS_SIDE], bb[BB_HASH], st[POS_EVAL], depth - 1, -INF, -alpha, 1, False,
+                     w['stop'], stats, w['move_buf'], w['killers'], w['history'], w['tt_keys'], w['tt_vals'], gen,
+                     cfg)
+    if flags[SHARED_STOP]:
+        return sq, 0, False, 1, int(stats[ST_NODES])
+    with w['lock']:
+        if score > flags[SHARED_ALPHA]:
+            flags[SHARED_ALPHA] = score
+    return sq, score, score > alpha, int(stats[ST_HORIZON]), int(stats[ST_NODES])
+
+
+def warm_up(depth, cfg):
+    # 预热：第一次调用 numba 函数的开销与进程启动一样，每局只付一次
+    time.sleep(0.05)
+    return search_move(START_BLACK, START_WHITE, 19, depth, 0, cfg)
+
+
+class RootSplitter(object):
+    # 把根结点的各个走步分给常驻的进程池并行搜索：先单独搜第一个走步得到 alpha，其余走步再同时提交
+    def __init__(self, workers, cfg):
+        self.workers = workers
+        self.shared = multiprocessing.RawArray('q', SHARED_SIZE)
+        self.flags = np.frombuffer(self.shared, dtype=np.int64)
+        self.lock = multiprocessing.Lock()
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(self.shared, self.lock))
+        self.flags[SHARED_ALPHA] = -INF
+        for f in [self.pool.submit(warm_up, 2, cfg) for _ in range(workers)]:
+            f.result()
+
+    def search(self, me, opp, moves, depth, gen, cfg, stop):
+        # moves 按先搜的顺序排列；stop[0] 被置位时取消所有任务并返回 None，
+        # 否则返回 ({sq: score}, best_sq, best_score, resolved, nodes)
+        self.flags[SHARED_STOP] = 0
+        self.flags[SHARED_ALPHA] = -INF
+        results = self._run(me, opp, moves[:1], depth, gen, cfg, stop)
+        if results is not None and len(moves) > 1:
+            rest = self._run(me, opp, moves[1:], depth, gen, cfg, stop)
+            results = None if rest is None else results + rest
+        if results is None:
+            return None
+        scores = {}
+        best_sq, best_score = -1, -INF - 1
+        resolved = True
+        nodes = 0
+        for sq, score, exact, horizon, n in results:
+            scores[sq] = score
+            nodes += n
+            resolved = resolved and horizon == 0
+            if (exact or best_sq < 0) and score > best_score:
+                best_sq, best_score = sq, score
+        return scores, best_sq, best_score, resolved, nodes
+
+    def _run(self, me, opp, moves, depth, gen, cfg, stop):
+        pending = {self.pool.submit(search_move, me, opp, sq, depth, gen, cfg) for sq in moves}
+        results = []
+        while pending:
+            done, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            results.extend(f.result() for f in done)
+            if stop[0]:
+                self.cancel(pending)
+                return None
+        return results
+
+    def cancel(self, pending):
+        # 未开始的任务直接取消，正在搜索的任务看到共享的 stop 标志后很快返回
+        self.flags[SHARED_STOP] = 1
+        for f in pending:
+            f.cancel()
+        wait(pending)
+
+    def close(self):
+        self.flags[SHARED_STOP] = 1
+        self.pool.shutdown(wait=True, cancel_futures=True)
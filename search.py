@@ -0,0 +1,286 @@
+import numpy as np
+import numba
+from bitboard import U, get_moves, get_flips
+from evaluate import move_delta, mobility_score
+from tt import (SIDE_KEY, TT_EXACT, TT_LOWER, TT_UPPER, RESOLVED_DEPTH, update_hash, tt_probe, tt_store,
+                tt_score, tt_depth, tt_flag, tt_move)
+from symmetry import SYM_SQ, INV_SQ, table_key
+from profiler import (cycles, PROFILE_PERIOD, PH_STOP, PH_TT, PH_MOVEGEN, PH_ORDER, PH_MAKE, PH_EVAL,
+                      N_PHASES)
+from ordering import NO_MOVE, new_ordering, move_sq, order_moves, move_to_front, add_killer, add_history
+from position import BB_P, BB_O, BB_HASH, POS_SIDE, POS_EVAL, MAX_GAME_PLY, new_position, make_move, unmake
+
+MAX_PLY = MAX_GAME_PLY
+MAX_MOVES = 64
+INF = 1 << 30
+
+# stats 数组下标
+ST_NODES = 0        # 访问的结点数
+ST_HORIZON = 1      # 因深度耗尽而停止的叶结点数，为 0 说明整棵树已经搜到终局
+ST_RESEARCH = 2     # PVS 零窗口搜索失败后的重搜次数
+ST_FAIL_LOW = 3     # 渴望窗口（aspiration window）向下失败的次数，由 main.AI.deepen 计数
+ST_FAIL_HIGH = 4    # 渴望窗口向上失败的次数
+ST_CUTOFFS = 5      # beta 截断的次数
+ST_FIRST_CUTOFFS = 6    # 其中由第一个走步产生的次数，与 ST_CUTOFFS 之比衡量走步排序的好坏
+ST_EVALS = 7        # 返回估值的叶结点数（深度耗尽或双方都无子可下）
+ST_TT_PROBES = 8    # 置换表查询次数
+ST_TT_HITS = 9      # 其中命中的次数
+ST_PROF_SAMPLES = 10    # 分析模式下采样的结点数
+ST_PROF = 11        # 之后每个阶段两项：采样结点在该阶段的周期数、计时次数（见 profiler.py）
+STATS_SIZE = ST_PROF + 2 * N_PHASES
+
+# cfg 数组下标：搜索内核的开关
+CFG_PVS = 0         # 非 0 时除第一个走步外都先用零窗口搜索
+CFG_KILLERS = 1     # 非 0 时记录 killer 走步
+CFG_HISTORY = 2     # 非 0 时更新 history 表
+CFG_ROOT_ORDER = 3  # 大于 0 时先用该深度的浅层搜索给根结点走步排序
+CFG_SYMMETRY = 4    # 非 0 时开局附近的置换表项按对称归一化的局面存取
+CFG_PROFILE = 5     # 非 0 时对结点采样，统计各阶段的周期数
+CFG_SIZE = 6
+
+CHECK_MASK = 1023   # 每 1024 个结点检查一次 stop 标志
+ROOT_ORDER_DEPTH = 1
+
+
+def new_buffers():
+    # 搜索用的预分配数组：局面（含 undo 栈）、stop 标志、统计量、每层的走步列表、killer 与 history 表
+    bb, st, undo = new_position(0, 0)
+    stop = np.zeros(1, dtype=np.int64)
+    stats = np.zeros(STATS_SIZE, dtype=np.int64)
+    move_buf = np.zeros((MAX_PLY, MAX_MOVES), dtype=np.int64)
+    killers, history = new_ordering(MAX_PLY)
+    return bb, st, undo, stop, stats, move_buf, killers, history
+
+
+def new_config(pvs=True, killers=True, history=True, root_order=ROOT_ORDER_DEPTH, symmetry=True, profile=False):
+    cfg = np.zeros(CFG_SIZE, dtype=np.int64)
+    cfg[CFG_PVS] = pvs
+    cfg[CFG_KILLERS] = killers
+    cfg[CFG_HISTORY] = history
+    cfg[CFG_ROOT_ORDER] = root_order
+    cfg[CFG_SYMMETRY] = symmetry
+    cfg[CFG_PROFILE] = profile
+    return cfg
+
+
+@numba.njit('void(int64[:], int64, int64)', nogil=True, inline='always', cache=True)
+def add_phase(stats, phase, start):
+    stats[ST_PROF + 2 * phase] += cycles() - start
+    stats[ST_PROF + 2 * phase + 1] += 1
+
+
+@numba.njit('int64(uint64, uint64, int64, uint64, int64, int64, int64, int64, int64, boolean, '
+            'int64[:], int64[:], int64[:, :], int64[:, :], int64[:, :], uint64[:], int64[:], int64, int64[:])',
+            nogil=True, cache=True)
+def negamax(P, O, side, h, e, depth, alpha, beta, ply, passed, stop, stats, move_buf, killers, history,
+            tt_keys, tt_vals, gen, cfg):
+    # P/O/h/e 按值传递（寄存器中的 copy-make 比在 bb 上原地走子、悔棋更快）；
+    # e 为当前局面的估值（站在 AI 一方），随走子增量更新，叶结点不再扫描棋盘
+    stats[ST_NODES] += 1
+    # 分析模式下的采样结点：各阶段前后读周期计数器
+    sample = cfg[CFG_PROFILE] != 0 and stats[ST_NODES] % PROFILE_PERIOD == 0
+    t = 0
+    if sample:
+        stats[ST_PROF_SAMPLES] += 1
+        t = cycles()
+    if (stats[ST_NODES] & CHECK_MASK) == 0 and stop[0]:
+        return 0
+    if sample:
+        add_phase(stats, PH_STOP, t)
+    if depth == 0:
+        stats[ST_HORIZON] += 1
+        stats[ST_EVALS] += 1
+        # 与走子方有关的行动力项在叶结点计算，分析模式下计入 eval 阶段
+        if sample:
+            t = cycles()
+        score = e * side + mobility_score(P, O)
+        if sample:
+            add_phase(stats, PH_EVAL, t)
+        return score
+
+    alpha_orig = alpha
+    hash_move = -1
+    if sample:
+        t = cycles()
+    # 表中的走步是归一化局面中的格子，s 为把当前局面变成归一化局面的对称
+    key, s = table_key(P, O, side, h, cfg[CFG_SYMMETRY] != 0)
+    v = tt_probe(tt_keys, tt_vals, key)
+    stats[ST_TT_PROBES] += 1
+    if v != 0:
+        stats[ST_TT_HITS] += 1
+        if tt_move(v) >= 0:
+            hash_move = INV_SQ[s, tt_move(v)]
+        if tt_depth(v) >= depth:
+            score = tt_score(v)
+            flag = tt_flag(v)
+            if flag == TT_EXACT or (flag == TT_LOWER and score >= beta) or (flag == TT_UPPER and score <= alpha):
+                if tt_depth(v) != RESOLVED_DEPTH:
+                    stats[ST_HORIZON] += 1
+                if sample:
+                    add_phase(stats, PH_TT, t)
+                return score
+    horizon = stats[ST_HORIZON]
+    if sample:
+        add_phase(stats, PH_TT, t)
+        t = cycles()
+    moves = get_moves(P, O)
+    if sample:
+        add_phase(stats, PH_MOVEGEN, t)
+        t = cycles()
+    n = order_moves(moves, ply, move_buf, side, hash_move, killers, history)
+    if sample:
+        add_phase(stats, PH_ORDER, t)
+    if n == 0:
+        if passed:
+            # 双方都无子可下，局面不会再变化；与深度截断的叶结点用同样的估值
+            stats[ST_EVALS] += 1
+            return e * side + mobility_score(P, O)
+        # 递归调用中的布尔常量写成 np.bool_：字面量参数会让 numba 另外编译一个特化版本，而它不会写进磁盘缓存
+        return -negamax(O, P, -side, h ^ SIDE_KEY, e, depth - 1, -beta, -alpha, ply + 1, np.bool_(True),
+                        stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+    pvs = cfg[CFG_PVS] != 0
+    value = -INF
+    best_sq = -1
+    for i in range(n):
+        if sample:
+            t = cycles()
+        sq = move_sq(move_buf[ply, i])
+        flips = get_flips(P, O, sq)
+        cP = O ^ flips
+        cO = P | flips | (U(1) << U(sq))
+        ch = update_hash(h, side, sq, flips)
+        if sample:
+            add_phase(stats, PH_MAKE, t)
+            t = cycles()
+        ce = e + move_delta(P, O, side, sq, flips)
+        if sample:
+            add_phase(stats, PH_EVAL, t)
+        if i == 0 or not pvs:
+            score = -negamax(cP, cO, -side, ch, ce, depth - 1, -beta, -alpha, ply + 1, np.bool_(False),
+                             stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+        else:
+            # 先证明该走步不比当前最好的更好，失败时再用完整窗口重搜
+            score = -negamax(cP, cO, -side, ch, ce, depth - 1, -alpha - 1, -alpha, ply + 1, np.bool_(False),
+                             stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+            if alpha < score < beta and not stop[0]:
+                stats[ST_RESEARCH] += 1
+                score = -negamax(cP, cO, -side, ch, ce, depth - 1, -beta, -alpha, ply + 1, np.bool_(False),
+                                 stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+        if stop[0]:
+            return 0
+        if score > value:
+            value = score
+            best_sq = sq
+        if value > alpha:
+            alpha = value
+        if alpha >= beta:
+            stats[ST_CUTOFFS] += 1
+            if i == 0:
+                stats[ST_FIRST_CUTOFFS] += 1
+            if sample:
+                t = cycles()
+            if cfg[CFG_KILLERS]:
+                add_killer(killers, ply, sq)
+            if cfg[CFG_HISTORY]:
+                add_history(history, side, sq, depth)
+            if sample:
+                add_phase(stats, PH_ORDER, t)
+            break
+
+    if value <= alpha_orig:
+        flag = TT_UPPER
+    elif value >= beta:
+        flag = TT_LOWER
+    else:
+        flag = TT_EXACT
+    if sample:
+        t = cycles()
+    # 子树中没有叶结点被深度截断时，结果与深度无关
+    tt_store(tt_keys, tt_vals, key, value, depth if stats[ST_HORIZON] != horizon else RESOLVED_DEPTH,
+             flag, SYM_SQ[s, best_sq], gen)
+    if sample:
+        add_phase(stats, PH_TT, t)
+    return value
+
+
+@numba.njit('void(uint64[:], int64[:], uint64[:, :], int64, int64, int64[:], int64[:], int64[:, :], '
+            'int64[:, :], int64[:, :], uint64[:], int64[:], int64, int64[:])', nogil=True, cache=True)
+def order_root(bb, st, undo, n, depth, stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg):
+    # 用 depth 层的完整窗口搜索给 move_buf[0] 中的根走步重新排序，得分高的在前
+    horizon = stats[ST_HORIZON]
+    for i in range(n):
+        sq = move_sq(move_buf[0, i])
+        make_move(bb, st, undo, sq, get_flips(bb[BB_P], bb[BB_O], sq))
+        score = -negamax(bb[BB_P], bb[BB_O], st[POS_SIDE], bb[BB_HASH], st[POS_EVAL], depth - 1, -INF, INF, 1,
+                         False, stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+        unmake(bb, st, undo)
+        v = (score + INF) * 64 + 63 - sq
+        j = i
+        while j > 0 and move_buf[0, j - 1] < v:
+            move_buf[0, j] = move_buf[0, j - 1]
+            j -= 1
+        move_buf[0, j] = v
+    # 浅层搜索的叶结点不影响“整棵树已搜到终局”的判断
+    stats[ST_HORIZON] = horizon
+
+
+@numba.njit('Tuple((int64, int64))(uint64[:], int64[:], uint64[:, :], int64, int64, int64, int64[:], int64[:], '
+            'int64[:, :], int64[:, :], int64[:, :], uint64[:], int64[:], int64, int64[:])', nogil=True, cache=True)
+def search_root(bb, st, undo, depth, alpha, beta, stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen,
+                cfg):
+    # bb/st 为根局面（AI 走子），在窗口 (alpha, beta) 内搜索；返回 (score, best_sq)，无子可下时 best_sq 为 -1。
+    # fail-soft：score <= alpha 或 score >= beta 时只是上界 / 下界
+    stats[ST_NODES] += 1
+    P = bb[BB_P]
+    O = bb[BB_O]
+    h = bb[BB_HASH]
+    n = order_moves(get_moves(P, O), 0, move_buf, 1, NO_MOVE, killers, history)
+    if 0 < cfg[CFG_ROOT_ORDER] < depth - 1:
+        order_root(bb, st, undo, n, cfg[CFG_ROOT_ORDER], stop, stats, move_buf, killers, history,
+                   tt_keys, tt_vals, gen, cfg)
+    key, s = table_key(P, O, 1, h, cfg[CFG_SYMMETRY] != 0)
+    v = tt_probe(tt_keys, tt_vals, key)
+    if v != 0 and tt_move(v) >= 0:
+        # 上一轮迭代（或上一步棋）的最佳走步先搜
+        move_to_front(move_buf, 0, n, INV_SQ[s, tt_move(v)])
+    pvs = cfg[CFG_PVS] != 0
+    alpha_orig = alpha
+    best_sq = -1
+    value = -INF
+    for i in range(n):
+        sq = move_sq(move_buf[0, i])
+        make_move(bb, st, undo, sq, get_flips(P, O, sq))
+        cP = bb[BB_P]
+        cO = bb[BB_O]
+        ch = bb[BB_HASH]
+        ce = st[POS_EVAL]
+        if i == 0 or not pvs:
+            score = -negamax(cP, cO, -1, ch, ce, depth - 1, -beta, -alpha, 1, False,
+                             stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+        else:
+            score = -negamax(cP, cO, -1, ch, ce, depth - 1, -alpha - 1, -alpha, 1, False,
+                             stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+            if alpha < score < beta and not stop[0]:
+                stats[ST_RESEARCH] += 1
+                score = -negamax(cP, cO, -1, ch, ce, depth - 1, -beta, -alpha, 1, False,
+                                 stop, stats, move_buf, killers, history, tt_keys, tt_vals, gen, cfg)
+        unmake(bb, st, undo)
+        if stop[0]:
+            break
+        if score > value:
+            value = score
+            best_sq = sq
+        if value > alpha:
+            alpha = value
+        if alpha >= beta:
+            break
+    if not stop[0] and best_sq >= 0:
+        if value <= alpha_orig:
+            flag = TT_UPPER
+        elif value >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        tt_store(tt_keys, tt_vals, key, value, depth if stats[ST_HORIZON] else RESOLVED_DEPTH, flag,
+                 SYM_SQ[s, best_sq], gen)
+    return value, best_sq
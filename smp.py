@@ -0,0 +1,76 @@
+import os
+import threading
+
+from search import search_root, new_buffers, MAX_PLY, INF, ST_NODES, ST_HORIZON
+from position import set_position
+from ordering import NO_MOVE
+
+MAX_THREADS = 8
+
+
+def available_cores():
+    # 考虑进程的 CPU 亲和性（容器、taskset 下可能少于 cpu_count）
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_threads():
+    return max(1, min(available_cores(), MAX_THREADS))
+
+
+class LazySMP(object):
+    # Lazy SMP：辅助线程与主线程搜索同一个根局面，只通过共享的置换表交换信息。
+    # search_root 为 nogil 的 numba 函数，所以 Python 线程可以真正并行。
+    # 辅助线程 k 从 depth + 1 + k % 2 开始加深，与主线程错开深度
+    def __init__(self, n_helpers):
+        self.buffers = [new_buffers() for _ in range(n_helpers)]
+        self.threads = []
+        self.results = []
+        self.nodes = []
+
+    def start(self, me, opp, depth, stop, tt_keys, tt_vals, gen, cfg):
+        n = len(self.buffers)
+        self.results = [None] * n
+        self.nodes = [0] * n
+        self.threads = [threading.Thread(target=self._helper,
+                                         args=(k, me, opp, depth, stop, tt_keys, tt_vals, gen, cfg))
+                        for k in range(n)]
+        for t in self.threads:
+            t.daemon = True
+            t.start()
+
+    def finish(self, stop):
+        # 让辅助线程停下并等待；返回最深的完成结果 (depth, score, sq)（没有时为 None）和辅助线程的总结点数
+        stop[0] = 1
+        for t in self.threads:
+            t.join()
+        self.threads = []
+        done = [r for r in self.results if r is not None]
+        best = max(done, key=lambda r: r[0]) if done else None
+        return best, sum(self.nodes)
+
+    def _helper(self, k, me, opp, depth, stop, tt_keys, tt_vals, gen, cfg):
+        deepen_in_background(self.buffers[k], me, opp, depth + 1 + k % 2, stop, tt_keys, tt_vals, gen, cfg,
+                             self.results, self.nodes, k)
+
+
+def deepen_in_background(buffers, me, opp, depth, stop, tt_keys, tt_vals, gen, cfg, results, nodes, k):
+    # 在 buffers（new_buffers() 的返回值）上从 depth 开始迭代加深，直到 stop[0] 被置位或搜到终局；
+    # 每完成一轮把 (depth, score, sq) 写入 results[k]，结点数累加到 nodes[k]
+    bb, st, undo, _, stats, move_buf, killers, history = buffers
+    set_position(bb, st, me, opp)
+    killers.fill(NO_MOVE)
+    history.fill(0)
+    while depth < MAX_PLY and not stop[0]:
+        stats[:] = 0
+        score, sq = search_root(bb, st, undo, depth, -INF, INF, stop, stats, move_buf, killers, history,
+                                tt_keys, tt_vals, gen, cfg)
+        nodes[k] += int(stats[ST_NODES])
+        if stop[0]:
+            break
+        if sq >= 0:
+            results[k] = (depth, int(score), int(sq))
+        if stats[ST_HORIZON] == 0:
+            break
+        depth += 1
@@ -0,0 +1,104 @@
+import numpy as np
+import numba
+from bitboard import U, popcount
+from tt import zobrist_hash
+
+# 棋盘的 8 种对称（D4 二面体群）在位棋盘和格子编号上的作用，以及对称归一化：
+# 8 种对称下 Zobrist hash 最小者为代表，置换表、开局库和训练数据中对称的局面共用一项
+
+# 子数不超过这么多时置换表按归一化的 hash 存取。对称的局面只在开局最初几步出现，
+# 再往后每个结点多算 8 次 hash 得不偿失
+SYMMETRY_DISCS = 10
+
+
+@numba.njit('uint64(uint64)', nogil=True, cache=True)
+def flip_vertical(x):
+    # 第 r 行与第 7 - r 行互换
+    x = ((x >> U(8)) & U(0x00FF00FF00FF00FF)) | ((x & U(0x00FF00FF00FF00FF)) << U(8))
+    x = ((x >> U(16)) & U(0x0000FFFF0000FFFF)) | ((x & U(0x0000FFFF0000FFFF)) << U(16))
+    return (x >> U(32)) | (x << U(32))
+
+
+@numba.njit('uint64(uint64)', nogil=True, cache=True)
+def flip_horizontal(x):
+    # 第 c 列与第 7 - c 列互换
+    x = ((x >> U(1)) & U(0x5555555555555555)) | ((x & U(0x5555555555555555)) << U(1))
+    x = ((x >> U(2)) & U(0x3333333333333333)) | ((x & U(0x3333333333333333)) << U(2))
+    return ((x >> U(4)) & U(0x0F0F0F0F0F0F0F0F)) | ((x & U(0x0F0F0F0F0F0F0F0F)) << U(4))
+
+
+@numba.njit('uint64(uint64)', nogil=True, cache=True)
+def transpose(x):
+    # (r, c) 与 (c, r) 互换
+    t = U(0x0F0F0F0F00000000) & (x ^ (x << U(28)))
+    x ^= t ^ (t >> U(28))
+    t = U(0x3333000033330000) & (x ^ (x << U(14)))
+    x ^= t ^ (t >> U(14))
+    t = U(0x5500550055005500) & (x ^ (x << U(7)))
+    x ^= t ^ (t >> U(7))
+    return x
+
+
+@numba.njit('uint64(uint64, int64)', nogil=True, cache=True)
+def apply_symmetry(x, s):
+    # 8 种对称：bit 2 为转置，bit 0 为左右翻转，bit 1 为上下翻转，按此顺序施加
+    if s & 4:
+        x = transpose(x)
+    if s & 1:
+        x = flip_horizontal(x)
+    if s & 2:
+        x = flip_vertical(x)
+    return x
+
+
+def _square_tables():
+    sym = np.zeros((8, 64), dtype=np.int64)
+    for s in range(8):
+        for sq in range(64):
+            r, c = sq >> 3, sq & 7
+            if s & 4:
+                r, c = c, r
+            if s & 1:
+                c = 7 - c
+            if s & 2:
+                r = 7 - r
+            sym[s, sq] = r * 8 + c
+    inv = np.zeros_like(sym)
+    for s in range(8):
+        inv[s, sym[s]] = np.arange(64)
+    return sym, inv
+
+
+# SYM_SQ[s, sq]：格子 sq 在对称 s 下的位置；INV_SQ 为其逆
+SYM_SQ, INV_SQ = _square_tables()
+
+
+@numba.njit('Tuple((uint64, int64))(uint64, uint64, int64)', nogil=True, cache=True)
+def canonical(P, O, side):
+    # 在 8 种对称中取 hash 最小者，返回 (hash, s)；side 的含义与 zobrist_hash 相同。
+    # 归一化局面中的走步 SYM_SQ[s, sq] 对应原局面中的 INV_SQ[s, sq]
+    best = U(0)
+    best_s = -1
+    for s in range(8):
+        h = zobrist_hash(apply_symmetry(P, s), apply_symmetry(O, s), side)
+        if best_s < 0 or h < best:
+            best = h
+            best_s = s
+    return best, best_s
+
+
+@numba.njit('Tuple((uint64, int64))(uint64, uint64, int64, uint64, boolean)', nogil=True, cache=True)
+def table_key(P, O, side, h, symmetric):
+    # 置换表的键 (key, s)：开局附近（且 symmetric 为真时）取归一化的 hash，否则为增量维护的 h 与恒等对称
+    if symmetric and popcount(P | O) <= SYMMETRY_DISCS:
+        return canonical(P, O, side)
+    return h, 0
+
+
+@numba.njit(nogil=True, cache=True)
+def canonicalize(P, O):
+    # 把一批局面原地换成各自的归一化形式
+    for n in range(P.shape[0]):
+        s = canonical(P[n], O[n], 1)[1]
+        P[n] = apply_symmetry(P[n], s)
+        O[n] = apply_symmetry(O[n], s)
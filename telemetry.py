@@ -0,0 +1,58 @@
+import json
+from dataclasses import dataclass, field, asdict
+
+
+@dataclass
+class MoveTelemetry:
+    # 一次 go() 的统计，由 main.AI 在每一步结束时生成（AI.telemetry）。
+    # mode 为 'book'、'endgame'、'search'、'split' 或 'ponder'（后台思考命中后继续加深）；
+    # nodes 含 Lazy SMP 辅助线程与根结点并行的工作进程，其余计数只来自主线程
+    round: int
+    color: int
+    empties: int
+    mode: str
+    move: tuple = None
+    score: int = None
+    seconds: float = 0.0
+    nodes: int = 0
+    leaf_evals: int = 0
+    cutoffs: int = 0
+    first_cutoffs: int = 0
+    tt_probes: int = 0
+    tt_hits: int = 0
+    depth_completed: int = 0
+    depth_aborted: int = 0      # 被 stop 打断的那一轮的深度，没有被打断时为 0
+    iterations: list = field(default_factory=list)  # 即 AI.depth_stats：每个完成的深度一项
+
+    @property
+    def nodes_per_sec(self):
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def first_cutoff_rate(self):
+        return self.first_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def to_dict(self):
+        d = asdict(self)
+        d['nodes_per_sec'] = round(self.nodes_per_sec)
+        d['first_cutoff_rate'] = round(self.first_cutoff_rate, 4)
+        d['tt_hit_rate'] = round(self.tt_hit_rate, 4)
+        return d
+
+
+class TelemetryLog(object):
+    # 每一步一行 JSON，追加写入；每行写完立即 flush，进程被评测程序杀掉时也不丢已有的记录
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a')
+
+    def write(self, record):
+        self.file.write(json.dumps(record.to_dict()) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,77 @@
+import time
+
+# 评测程序对每一步单独计时（time_out 秒）；留出 SAFETY_MARGIN 秒给进程调度和 go() 返回之后的开销
+SAFETY_MARGIN = 0.2
+MIN_BUDGET = 0.05
+
+# 按空格数划分阶段时，软限制占硬限制的比例：开局走法差别小，中局最需要时间，
+# 接近残局求解时多搜一层往往就能直接搜到终局
+PHASE_FACTORS = ((50, 0.6), (30, 0.85), (0, 1.0))
+
+STABLE_ITERATIONS = 4       # 最佳走步连续这么多轮不变时提前结束
+STABLE_FRACTION = 0.4       # 且已用时间超过软限制的这一比例
+DEFAULT_EBF = 3.0           # 还没有两轮结果时使用的分支因子
+MAX_EBF = 8.0
+
+
+class TimeManager(object):
+    # 每一步的时间分配：硬限制到时由计时器置 stop 标志；软限制决定是否开始下一轮迭代。
+    # 所有时间都取自单调时钟 time.perf_counter()
+    def __init__(self, time_out, margin=SAFETY_MARGIN):
+        self.time_out = time_out
+        self.margin = margin
+        self.start(60)
+
+    def start(self, empties, limit=None):
+        # limit 不为 None 时直接作为硬限制（用于对比实验），否则由 time_out 推出
+        self.start_time = self.iter_start = time.perf_counter()
+        self.hard = max(limit if limit is not None else self.time_out - self.margin, MIN_BUDGET)
+        for min_empties, factor in PHASE_FACTORS:
+            if empties >= min_empties:
+                self.soft = self.hard * factor
+                break
+        self.iter_times = []
+        self.iter_nodes = []
+        self.best_sq = -1
+        self.stable = 0
+
+    def limit(self, fraction):
+        # 接下来的迭代加深只用剩余时间的 fraction（残局求解之前的保底搜索）；返回原来的 (soft, hard)，之后交给 restore
+        saved = self.soft, self.hard
+        self.soft = self.hard = self.elapsed() + self.remaining() * fraction
+        return saved
+
+    def restore(self, saved):
+        self.soft, self.hard = saved
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def remaining(self):
+        return self.hard - self.elapsed()
+
+    def ebf(self):
+        # 最近几轮结点数之比的几何平均（最多取两个比值）估计有效分支因子
+        nodes = self.iter_nodes[-3:]
+        if len(nodes) < 2 or nodes[0] == 0:
+            return DEFAULT_EBF
+        ratio = (nodes[-1] / nodes[0]) ** (1.0 / (len(nodes) - 1))
+        return min(max(ratio, 1.0), MAX_EBF)
+
+    def iteration_done(self, nodes, best_sq):
+        # 每完成一轮迭代调用一次，返回是否应该开始下一轮
+        now = time.perf_counter()
+        self.iter_times.append(now - self.iter_start)
+        self.iter_nodes.append(nodes)
+        self.iter_start = now
+        if best_sq == self.best_sq:
+            self.stable += 1
+        else:
+            self.best_sq = best_sq
+            self.stable = 1
+        elapsed = now - self.start_time
+        if self.stable >= STABLE_ITERATIONS and elapsed > self.soft * STABLE_FRACTION:
+            return False
+        # 超过软限制后不再开始新的一轮；预计下一轮在硬限制之前完不成时也不开始，把时间省下来
+        predicted = self.iter_times[-1] * self.ebf()
+        return elapsed < self.soft and elapsed + predicted < self.hard
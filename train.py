@@ -0,0 +1,200 @@
+import argparse
+import os
+import random
+import time
+
+import numba
+import numpy as np
+
+from bitboard import START_BLACK, START_WHITE, get_moves, get_flips, popcount, iter_bits
+from patterns import N_PATTERNS, N_WEIGHTS, PAT_OFFSET, CANON_INDEX, pattern_index, write_weights, WEIGHTS_PATH
+from search import INF
+from symmetry import canonicalize
+from endgame import solve_root
+
+# 估值权重的离线训练，分三步：
+#   generate  自对弈生成局面，用残局求解得到的精确终局子数差作标签
+#   store     局面按列追加到数据目录下的定长二进制文件，训练时 memmap 流式读取
+#   fit       分批用向量化的梯度下降拟合模式表，结果写成 patterns.py 读取的权重文件
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+COLUMNS = (('me', '<u8'), ('opp', '<u8'), ('label', 'i1'))
+
+GEN_DEPTH = 4               # 自对弈每一步的搜索深度
+LABEL_EMPTIES = 14          # 空格数降到这里时精确求解，该局之前的局面都以求解结果为标签
+OPENING_PLIES = (4, 16)     # 随机开局的步数范围，保证局面的多样性
+FLUSH_GAMES = 100           # 每这么多局写一次盘
+
+DISC_SCALE = 5              # 一个子对应的估值，与 evaluate_linear 的 5*son 保持同一量级
+BATCH_SIZE = 8192
+EPOCHS = 4
+LEARNING_RATE = 0.02
+SHRINK = 8                  # 出现次数少的权重步长按 count / (count + SHRINK) 缩小
+HOLDOUT = 0.05              # 末尾这一比例的数据只用于验证
+
+
+class PositionStore(object):
+    # 每一列一个文件（data/me.u8 等），追加时直接写到文件末尾，读取时 memmap，不整体读入内存
+    def __init__(self, path=DATA_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, name, dtype):
+        return os.path.join(self.path, '%s.%s' % (name, np.dtype(dtype).str[1:]))
+
+    def __len__(self):
+        sizes = [os.path.getsize(self._file(name, dtype)) // np.dtype(dtype).itemsize
+                 if os.path.exists(self._file(name, dtype)) else 0 for name, dtype in COLUMNS]
+        return min(sizes)
+
+    def append(self, **columns):
+        for name, dtype in COLUMNS:
+            with open(self._file(name, dtype), 'ab') as f:
+                np.asarray(columns[name], dtype=dtype).tofile(f)
+
+    def columns(self):
+        n = len(self)
+        return {name: np.memmap(self._file(name, dtype), dtype=dtype, mode='r', shape=(n,))
+                for name, dtype in COLUMNS} if n else None
+
+
+def play_game(ai, rng):
+    # 随机开局之后双方都用 GEN_DEPTH 层搜索下棋，空格数降到 LABEL_EMPTIES 时精确求解。
+    # 返回 [(me, opp, label)]：每个局面从双方视角各记一次，label 为 me 一方的终局子数差（对方 - 己方）
+    P, O, color = START_BLACK, START_WHITE, -1
+    history = []
+    for ply in range(rng.randint(*OPENING_PLIES)):
+        if not get_moves(P, O):
+            P, O, color = O, P, -color
+            if not get_moves(P, O):
+                return []
+        sq = rng.choice(list(iter_bits(get_moves(P, O))))
+        flips = get_flips(P, O, sq)
+        P, O, color = O ^ flips, P | flips | (1 << sq), -color
+    while True:
+        if not get_moves(P, O):
+            if not get_moves(O, P):
+                score = popcount(O) - popcount(P)
+                break
+            P, O, color = O, P, -color
+        if 64 - popcount(P | O) <= LABEL_EMPTIES:
+            ai.stop[0] = 0
+            score, _ = solve_root(P, O, -INF, INF, ai.stop, ai.stats, ai.move_buf)
+            break
+        history.append((P, O, color))
+        ai.generation += 1
+        ai.stop[0] = 0
+        _, sq = ai.minimax(P, O, GEN_DEPTH)
+        flips = get_flips(P, O, sq)
+        P, O, color = O ^ flips, P | flips | (1 << sq), -color
+    samples = []
+    for me, opp, c in history:
+        label = score if c == color else -score
+        samples.append((me, opp, label))
+        samples.append((opp, me, -label))
+    return samples
+
+
+def generate(store, games, seed=0, verbose=True):
+    import main
+    ai = main.AI(8, -1, 5)
+    rng = random.Random(seed)
+    buf = []
+    start = time.perf_counter()
+    for g in range(games):
+        buf.extend(play_game(ai, rng))
+        if (g + 1) % FLUSH_GAMES == 0 or g + 1 == games:
+            me, opp, label = zip(*buf) if buf else ((), (), ())
+            me, opp = np.array(me, dtype=np.uint64), np.array(opp, dtype=np.uint64)
+            # 对称的局面存成同一个形式，便于去重和统计
+            canonicalize(me, opp)
+            store.append(me=me, opp=opp, label=np.array(label, dtype=np.int8))
+            buf = []
+            if verbose:
+                print('%d/%d games, %d positions, %.1fs' % (g + 1, games, len(store), time.perf_counter() - start))
+    return len(store)
+
+
+@numba.njit('void(uint64[:], uint64[:], int64[:, :])', nogil=True, cache=True)
+def batch_features(me, opp, idx):
+    # 每个局面的 N_PATTERNS 个模式在权重表中的下标；对称的下标合并为 CANON_INDEX，一起训练
+    for n in range(me.shape[0]):
+        for i in range(N_PATTERNS):
+            idx[n, i] = CANON_INDEX[PAT_OFFSET[i] + pattern_index(me[n], opp[n], i)]
+
+
+def features(columns, lo, hi):
+    me = np.array(columns['me'][lo:hi], dtype=np.uint64)
+    opp = np.array(columns['opp'][lo:hi], dtype=np.uint64)
+    idx = np.empty((hi - lo, N_PATTERNS), dtype=np.int64)
+    batch_features(me, opp, idx)
+    target = DISC_SCALE * columns['label'][lo:hi].astype(np.float64)
+    return idx, target
+
+
+def rmse(columns, weights, lo, hi, batch=BATCH_SIZE):
+    # 以子数为单位的均方根误差
+    total, n = 0.0, 0
+    for s in range(lo, hi, batch):
+        idx, target = features(columns, s, min(s + batch, hi))
+        err = target - weights[idx].sum(axis=1)
+        total += float(err @ err)
+        n += len(err)
+    return (total / max(n, 1)) ** 0.5 / DISC_SCALE
+
+
+def fit(store, epochs=EPOCHS, batch=BATCH_SIZE, lr=LEARNING_RATE, seed=0, verbose=True):
+    # 拟合 target ≈ Σ weights[idx]：每批的误差按下标累加（bincount）得到梯度，
+    # 每个权重的步长按它在这一批中出现的次数归一化
+    columns = store.columns()
+    if columns is None:
+        raise ValueError('no training data in ' + store.path)
+    n = len(columns['label'])
+    n_train = n - int(n * HOLDOUT)
+    weights = np.zeros(N_WEIGHTS, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    starts = np.arange(0, n_train, batch)
+    if verbose:
+        print('%d positions, all-zero table: train %.2f, holdout %.2f discs'
+              % (n, rmse(columns, weights, 0, n_train), rmse(columns, weights, n_train, n)))
+    for epoch in range(epochs):
+        t = time.perf_counter()
+        for s in rng.permutation(starts):
+            idx, target = features(columns, s, min(s + batch, n_train))
+            err = target - weights[idx].sum(axis=1)
+            flat = idx.ravel()
+            grad = np.bincount(flat, weights=np.repeat(err, N_PATTERNS), minlength=N_WEIGHTS)
+            count = np.bincount(flat, minlength=N_WEIGHTS)
+            weights += lr * grad / (count + SHRINK)
+        if verbose:
+            print('epoch %d: train %.2f, holdout %.2f discs, %.1fs'
+                  % (epoch + 1, rmse(columns, weights, 0, n_train), rmse(columns, weights, n_train, n),
+                     time.perf_counter() - t))
+    # 只有 CANON_INDEX 中的下标被训练，展开到与它对称的下标
+    return np.round(weights[CANON_INDEX]).astype(np.int32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the pattern evaluation from self-play games.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    gen = sub.add_parser('generate', help='play self-play games and append labelled positions')
+    gen.add_argument('--games', type=int, default=1000)
+    gen.add_argument('--seed', type=int, default=0)
+    gen.add_argument('--data', default=DATA_DIR)
+    fit_parser = sub.add_parser('fit', help='fit pattern weights to the stored positions')
+    fit_parser.add_argument('--epochs', type=int, default=EPOCHS)
+    fit_parser.add_argument('--lr', type=float, default=LEARNING_RATE)
+    fit_parser.add_argument('--data', default=DATA_DIR)
+    fit_parser.add_argument('--out', default=WEIGHTS_PATH)
+    args = parser.parse_args()
+    store = PositionStore(args.data)
+    if args.command == 'generate':
+        n = generate(store, args.games, args.seed)
+        print('%d positions in %s' % (n, args.data))
+    else:
+        weights = fit(store, args.epochs, lr=args.lr)
+        write_weights(args.out, weights)
+        print('%d weights written to %s' % (len(weights), args.out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import numpy as np
+import numba
+from bitboard import U, lsb_index
+
+# Zobrist 键：ZOBRIST[0] 为 AI 一方的子，ZOBRIST[1] 为对方的子
+_rng = np.random.default_rng(20241017)
+ZOBRIST = _rng.integers(0, 1 << 64, size=(2, 64), dtype=np.uint64)
+FLIP_KEY = ZOBRIST[0] ^ ZOBRIST[1]      # 一个子被翻转时 hash 的变化
+SIDE_KEY = U(0x9E3779B97F4A7C15)        # 轮到对方走时异或该值
+
+# 置换表中的界类型
+TT_EXACT = 1
+TT_LOWER = 2
+TT_UPPER = 3
+RESOLVED_DEPTH = 255    # 子树已搜到终局，结果对任意深度都成立
+
+TT_SIZE_MB = 16
+ENTRY_BYTES = 16    # 每项一个 uint64 键和一个 int64 打包值
+
+# 打包值的布局：低 32 位 score + 2^31，其后依次为 depth(8)、flag(2)、move+1(7)、generation(8)
+SCORE_BIAS = 1 << 31
+
+
+def new_table(size_mb=TT_SIZE_MB):
+    # 项数取不超过内存上限的 2 的幂，两项为一个桶
+    n = 2
+    while n * 2 * ENTRY_BYTES <= size_mb * (1 << 20):
+        n *= 2
+    return np.zeros(n, dtype=np.uint64), np.zeros(n, dtype=np.int64)
+
+
+@numba.njit('uint64(uint64, uint64, int64)', nogil=True, cache=True)
+def zobrist_hash(P, O, side):
+    # side == 1 表示 P 为 AI 一方
+    ai = P if side == 1 else O
+    op = O if side == 1 else P
+    h = U(0) if side == 1 else SIDE_KEY
+    while ai:
+        h ^= ZOBRIST[0, lsb_index(ai)]
+        ai &= ai - U(1)
+    while op:
+        h ^= ZOBRIST[1, lsb_index(op)]
+        op &= op - U(1)
+    return h
+
+
+@numba.njit('uint64(uint64, int64, int64, uint64)', nogil=True, cache=True)
+def update_hash(h, side, sq, flips):
+    # side 一方在 sq 落子并翻转 flips 之后的 hash
+    h ^= SIDE_KEY ^ ZOBRIST[0 if side == 1 else 1, sq]
+    while flips:
+        h ^= FLIP_KEY[lsb_index(flips)]
+        flips &= flips - U(1)
+    return h
+
+
+@numba.njit('int64(int64, int64, int64, int64, int64)', nogil=True, cache=True)
+def tt_pack(score, depth, flag, move, gen):
+    return ((score + SCORE_BIAS) | (depth << 32) | (flag << 40)
+            | ((move + 1) << 42) | ((gen & 255) << 49))
+
+
+@numba.njit('int64(int64)', nogil=True, cache=True)
+def tt_score(v):
+    return (v & 0xFFFFFFFF) - SCORE_BIAS
+
+
+@numba.njit('int64(int64)', nogil=True, cache=True)
+def tt_depth(v):
+    return (v >> 32) & 255
+
+
+@numba.njit('int64(int64)', nogil=True, cache=True)
+def tt_flag(v):
+    return (v >> 40) & 3
+
+
+@numba.njit('int64(int64)', nogil=True, cache=True)
+def tt_move(v):
+    return ((v >> 42) & 127) - 1
+
+
+@numba.njit('int64(int64)', nogil=True, cache=True)
+def tt_gen(v):
+    return (v >> 49) & 255
+
+
+@numba.njit('int64(uint64[:], int64[:], uint64)', nogil=True, cache=True)
+def tt_probe(keys, vals, h):
+    # 返回命中项的打包值，未命中返回 0（打包值总不为 0）。
+    # 键中存的是 h ^ 值，多个线程同时读写时，写了一半的项对不上键，当作未命中，不需要加锁
+    i = np.int64(h & U(keys.shape[0] - 2))
+    for j in range(i, i + 2):
+        v = vals[j]
+        if keys[j] ^ U(v) == h:
+            return v
+    return 0
+
+
+@numba.njit('void(uint64[:], int64[:], uint64, int64, int64, int64, int64, int64)', nogil=True, cache=True)
+def tt_store(keys, vals, h, score, depth, flag, move, gen):
+    # 桶内第一项按深度优先替换（旧一代的项总可替换），第二项总是替换
+    i = np.int64(h & U(keys.shape[0] - 2))
+    v0 = vals[i]
+    if keys[i] ^ U(v0) == h:
+        j = i
+    elif keys[i + 1] ^ U(vals[i + 1]) == h:
+        j = i + 1
+    elif tt_gen(v0) != (gen & 255) or tt_depth(v0) <= depth:
+        j = i
+    else:
+        j = i + 1
+    v = tt_pack(score, depth, flag, move, gen)
+    vals[j] = v
+    keys[j] = h ^ U(v)